@@ -0,0 +1,133 @@
+"""
+Runs Engine and MateSearch searches in a worker process, so the pygame window keeps handling events while they think.
+
+The Game sends the worker a copy of the board and what to look for, and polls for results between events:
+- an engine search sends ("line", (depth, score, principal variation)) after every iteration it completes, and
+  ("done", stats) if it gets to the end
+- a mate search sends ("mate", (result, completed depth)) when it finishes
+
+Every request gets a generation number, and the latest generation is kept in a multiprocessing.Value. The worker's
+searches are cancelled as soon as it changes, so starting a new search or calling cancel() stops the old one within
+one node, and results that were already on their way from an old search are thrown away by poll().
+"""
+import multiprocessing
+import queue
+
+from Engine import Engine
+from MateSearch import MateSearch
+from MoveOrdering import MoveOrderer
+from SearchLimits import CancellationToken, SearchLimits
+from TranspositionTable import TranspositionTable
+
+ENGINE = "engine"
+MATE = "mate"
+
+
+class _Superseded:
+    """
+    The event behind the CancellationToken of one request: it is set once a newer request has been made.
+    """
+
+    def __init__(self, latest, generation):
+        self.latest = latest
+        self.generation = generation
+
+    def set(self):
+        with self.latest.get_lock():
+            self.latest.value += 1
+
+    def is_set(self):
+        return self.latest.value != self.generation
+
+
+def _run_worker(requests, results, latest, table_megabytes):
+    """
+    The worker process: searches each request in turn, skipping any that were replaced before it got to them.
+    The tables are kept between requests, so a position searched for one is not searched again for the next. Engine
+    and mate searches each have their own table and MoveOrderer, so the killers and history of one never steer the
+    other.
+    """
+    table = TranspositionTable(table_megabytes)
+    mate_table = TranspositionTable(table_megabytes)
+    ordering = MoveOrderer()
+    mate_ordering = MoveOrderer()
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        generation, kind, board, depth, start_positions = request
+        if latest.value != generation:
+            continue
+        limits = SearchLimits(token=CancellationToken(_Superseded(latest, generation)))
+        if kind == ENGINE:
+            engine = Engine(board, table, ordering, limits=limits)
+            engine.search(depth, report=lambda *line: results.put((generation, "line", line)))
+            if engine.stop_reason is None:
+                results.put((generation, "done", engine.stats()))
+        else:
+            search = MateSearch(board, mate_table, mate_ordering, limits)
+            result = search.mate_in(depth, start_positions)
+            if search.stop_reason is None:
+                results.put((generation, "mate", (result, search.completed_depth)))
+
+
+class BackgroundAnalysis:
+    """
+    Starts the worker process, which is a daemon so it never outlives the game. Use close() to stop it sooner.
+    kind is what the worker is searching for the Game (ENGINE or MATE), or None when it has nothing to report.
+    """
+
+    def __init__(self, table_megabytes=16):
+        self.latest = multiprocessing.Value('i', 0)
+        self.requests = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.worker = multiprocessing.Process(target=_run_worker,
+                                              args=(self.requests, self.results, self.latest, table_megabytes),
+                                              daemon=True)
+        self.worker.start()
+        self.generation = 0
+        self.kind = None
+
+    def start(self, kind, board, depth, start_positions=None):
+        """
+        Cancels whatever the worker is doing and starts searching the board: to depth with the Engine for ENGINE, or
+        for a mate in up to depth moves for MATE, with start_positions limiting the first move as in MateSearch.
+        """
+        self.cancel()
+        self.generation = self.latest.value
+        self.kind = kind
+        self.requests.put((self.generation, kind, board.copy(history=False), depth, start_positions))
+
+    def cancel(self):
+        """
+        Stops the current search. Nothing more is reported for it.
+        """
+        with self.latest.get_lock():
+            self.latest.value += 1
+        self.kind = None
+
+    @property
+    def running(self):
+        return self.kind is not None
+
+    def poll(self):
+        """
+        Returns the (message, payload) pairs the current search has sent since the last poll, without waiting.
+        """
+        messages = []
+        while True:
+            try:
+                generation, message, payload = self.results.get_nowait()
+            except queue.Empty:
+                return messages
+            if generation == self.generation and self.kind is not None:
+                messages.append((message, payload))
+                if message in ("done", "mate"):
+                    self.kind = None
+
+    def close(self):
+        self.cancel()
+        self.requests.put(None)
+        self.worker.join(1)
+        if self.worker.is_alive():
+            self.worker.terminate()
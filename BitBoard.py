@@ -0,0 +1,541 @@
+"""
+A bitboard version of the Chess+ position.
+
+Every square on the 10x10 board is one bit of a 100-bit Python int (bit row * 10 + col), so a set of squares is a
+single int and move generation is done with set operations instead of walking the board one square at a time.
+
+The BitBoard holds one int per piece code (piece type and colour, as in PieceCodes), plus occupancy for each colour,
+a mask of the squares that cannot be taken (invulnerable Pandas, Chickens, Death and Walls), and masks for the
+per-piece state that matters to move generation (has_moved and en passant).
+
+The masks for leapers are built from the tables in MoveTables, and the direction lists for sliders come from a
+prototype of each piece in Pieces.py, so the BitBoard follows the same rules as the ChessBoard.
+
+The BitBoard stands on its own: ChessBoard, Engine and Perft do not use it. Since the ChessBoard moved to a mailbox
+with per-code piece lists and cached adjacency, its check_check is about ten times faster than building and asking a
+BitBoard, and generating moves takes about as long either way, so switching the search over would not raise its node
+rate. It is kept as a second implementation of the move rules to check the ChessBoard against.
+
+Run from the command line, it checks that it does:
+    python BitBoard.py --positions 200    compares it with ChessBoard on random positions with a piece in each corner
+"""
+import argparse
+import random
+import sys
+
+from ChessBoard import ChessBoard
+from Pieces import *
+from PieceCodes import *
+import MoveTables
+
+FULL = (1 << 100) - 1
+COLUMN_0 = sum(1 << (row * 10) for row in range(10))
+COLUMN_9 = COLUMN_0 << 9
+
+RAY_STEPS = {"N": (-1, 0), "NE": (-1, 1), "E": (0, 1), "SE": (1, 1),
+             "S": (1, 0), "SW": (1, -1), "W": (0, -1), "NW": (-1, -1)}
+# Directions that walk towards higher bits. The nearest blocker is the lowest set bit for these, and the highest for
+# the others
+INCREASING = {"E", "SE", "S", "SW"}
+
+
+def square_bit(position):
+    row, col = position
+    if 0 <= row <= 9 and 0 <= col <= 9:
+        return 1 << (row * 10 + col)
+    return 0
+
+
+def mask_of(positions):
+    """
+    Turns a list of positions into a mask, leaving out any that are off the board.
+    """
+    mask = 0
+    for position in positions:
+        mask |= square_bit(position)
+    return mask
+
+
+def squares_in(mask):
+    """
+    Yields the square number of every set bit in the mask, lowest first.
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def positions_in(mask):
+    return [divmod(square, 10) for square in squares_in(mask)]
+
+
+def neighbours(mask):
+    """
+    Every square that is next to a square in the mask, in any of the 8 directions.
+    """
+    # Shifting a square in column 9 left would put a bit past the board, which the shift down would bring back on it
+    sideways = (mask | ((mask << 1) & ~COLUMN_0) | ((mask >> 1) & ~COLUMN_9)) & FULL
+    return (sideways | (sideways << 10) | (sideways >> 10)) & FULL
+
+
+def _ray(square, orientation, limit):
+    row, col = divmod(square, 10)
+    row_step, col_step = RAY_STEPS[orientation]
+    return mask_of([(row + row_step * distance, col + col_step * distance) for distance in range(1, limit + 1)])
+
+
+RAYS = {orientation: [_ray(square, orientation, 10) for square in range(100)] for orientation in RAY_STEPS}
+SHORT_RAYS = {(orientation, limit): [_ray(square, orientation, limit) for square in range(100)]
+              for orientation in RAY_STEPS for limit in range(1, 4)}
+
+
+# The bit for every mailbox index on the board
+INDEX_BITS = [0] * SIZE
+for _square, _index in enumerate(INDICES):
+    INDEX_BITS[_index] = 1 << _square
+
+
+def _masks(table):
+    """
+    Converts a table of index tuples from MoveTables into a mask for every square.
+    """
+    masks = []
+    for index in INDICES:
+        mask = 0
+        for target in table[index]:
+            mask |= INDEX_BITS[target]
+        masks.append(mask)
+    return masks
+
+
+def _pairs(table):
+    """
+    Converts a table of (target, dependancy) index pairs from MoveTables into (target mask, dependancy mask) pairs.
+    """
+    return [[(INDEX_BITS[move], INDEX_BITS[dependancy]) for move, dependancy in table[index]] for index in INDICES]
+
+
+# Leaper masks and dependant pairs, indexed by [piece code][square]
+MOVE_MASKS = {}
+TAKE_MASKS = {}
+DEPENDANT_MOVES = {}
+DEPENDANT_TAKES = {}
+# Direction lists for sliding pieces, indexed by piece code
+DIRECTION_MOVES = {}
+DIRECTION_TAKES = {}
+for _kind in range(1, len(PIECE_CLASSES)):
+    for _is_white in (True, False):
+        _code = piece_code(_kind, _is_white)
+        MOVE_MASKS[_code] = _masks(MoveTables.MOVES[_code])
+        TAKE_MASKS[_code] = _masks(MoveTables.TAKES[_code])
+        DEPENDANT_MOVES[_code] = _pairs(MoveTables.DEPENDANT_MOVES[_code])
+        DEPENDANT_TAKES[_code] = _pairs(MoveTables.DEPENDANT_TAKES[_code])
+        _piece = PIECE_CLASSES[_kind](_is_white, (5, 5))
+        DIRECTION_MOVES[_code] = _piece.direction_moves()
+        DIRECTION_TAKES[_code] = _piece.direction_takes()
+
+# Pawns get a 3 square slide on their starting row
+PAWN_SLIDES = {piece_code(PAWN, True): (8, [("N", 3)]), piece_code(PAWN, False): (1, [("S", 3)])}
+
+# The moves a Chicken can inherit, indexed by [is_white][square] or by [square]
+CHICKEN_PAWN_MOVES = {is_white: _masks(MoveTables.CHICKEN_PAWN_MOVES[piece_code(CHICKEN, is_white)])
+                      for is_white in (True, False)}
+CHICKEN_PAWN_TAKES = {is_white: _masks(MoveTables.CHICKEN_PAWN_TAKES[piece_code(CHICKEN, is_white)])
+                      for is_white in (True, False)}
+CHICKEN_KNIGHT_MOVES = _masks(MoveTables.CHICKEN_KNIGHT_MOVES)
+CHICKEN_FROG_MOVES = _masks(MoveTables.CHICKEN_FROG_MOVES)
+CHICKEN_KING_MOVES = _masks(MoveTables.CHICKEN_KING_MOVES)
+CHICKEN_BLOB0_DEPENDANT_MOVES = _pairs(MoveTables.CHICKEN_BLOB0_DEPENDANT_MOVES)
+_CHICKEN = Chicken(True, (5, 5))
+CHICKEN_PAWN_DIRECTIONS = {True: [("N", 3)], False: [("S", 3)]}
+CHICKEN_ROOK_DIRECTIONS = _CHICKEN.rook_direction_moves()
+CHICKEN_BISHOP_DIRECTIONS = _CHICKEN.bishop_direction_moves()
+CHICKEN_BLOB_DIRECTIONS = [_CHICKEN.blob0_direction_moves(), _CHICKEN.blob1_direction_moves(),
+                           _CHICKEN.blob2_direction_moves(), _CHICKEN.blob3_direction_moves()]
+
+
+def _en_passant_checks(square, is_white):
+    """
+    The (pawn square, target square) pairs looked at for en passant takes, in the same pattern as
+    ChessBoard.legal_takes.
+    """
+    row, col = divmod(square, 10)
+    forwards = -1 if is_white else 1
+    if row == (3 if is_white else 6):
+        pairs = [((row, col - 1), (row + forwards, col - 1)), ((row, col + 1), (row + forwards, col + 1)),
+                 ((row - forwards, col - 1), (row + forwards, col - 1)),
+                 ((row - forwards, col + 1), (row + forwards, col + 1))]
+    elif row == (4 if is_white else 5):
+        pairs = [((row, col - 1), (row + forwards, col - 1)), ((row, col + 1), (row + forwards, col + 1))]
+    else:
+        pairs = []
+    return [(square_bit(pawn), square_bit(target)) for pawn, target in pairs if square_bit(pawn)]
+
+
+EN_PASSANT_CHECKS = {is_white: [_en_passant_checks(square, is_white) for square in range(100)]
+                     for is_white in (True, False)}
+
+
+class BitBoard:
+    """
+    A position stored as bitboards, which can generate the same moves and takes as a ChessBoard.
+
+    Like ChessBoard.legal_moves(position, prevent_checks=False), the BitBoard does not look ahead to see if a move
+    would leave the player in check. It is a fast core for generating candidate moves and testing for attacks.
+    """
+
+    def __init__(self,
+                 board_state="RDOZAKBFDRPPPPPPPPPP                                                            pppppppppprdozakbfdr",
+                 white_to_move=True):
+        self.white_to_move = white_to_move
+        self.forced_square = None
+        self.boards = [0] * 256
+        self.white = 0
+        self.black = 0
+        self.invulnerable = 0
+        self.moved = 0
+        self.en_passantable = 0
+        for square, char in enumerate(board_state):
+            if char in CHAR_CODES:
+                code, flags = CHAR_CODES[char]
+                self.place(square, code, flags)
+                if char in "wW":
+                    self.forced_square = square
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Builds a BitBoard straight from the mailbox of a ChessBoard.
+        """
+        bit_board = cls("", board.white_to_move)
+        for square, index in enumerate(INDICES):
+            if board.mailbox[index] != EMPTY:
+                bit_board.place(square, board.mailbox[index], board.flags[index])
+        if board.forced_move is not None:
+            row, col = board.forced_move.position
+            bit_board.forced_square = row * 10 + col
+        return bit_board
+
+    def place(self, square, code, flags):
+        """
+        Puts a piece with the given code and flags on an empty square.
+        """
+        bit = 1 << square
+        self.boards[code] |= bit
+        if is_white_code(code):
+            self.white |= bit
+        else:
+            self.black |= bit
+        if flags & INVULNERABLE:
+            self.invulnerable |= bit
+        if flags & HAS_MOVED:
+            self.moved |= bit
+        if flags & EN_PASSANTABLE:
+            self.en_passantable |= bit
+
+    @property
+    def occupied(self):
+        return self.white | self.black
+
+    @property
+    def vulnerable(self):
+        """
+        The squares holding a piece that can be taken.
+        """
+        return self.occupied & ~self.invulnerable
+
+    def code_on(self, square):
+        bit = 1 << square
+        if not self.occupied & bit:
+            return EMPTY
+        for code, board in enumerate(self.boards):
+            if board & bit:
+                return code
+
+    def kind_mask(self, kind):
+        """
+        Every piece of the given kind, of either colour.
+        """
+        return self.boards[kind] | self.boards[kind | BLACK]
+
+    def slide(self, square, directions):
+        """
+        Follows each (orientation, limit) ray from the square until it meets a piece or runs out of squares.
+        Returns a mask of the empty squares reached, and a mask of the pieces that stopped the rays.
+        """
+        occupied = self.occupied
+        reached = 0
+        for orientation, limit in directions:
+            ray = RAYS[orientation][square] if limit >= 10 else SHORT_RAYS[orientation, limit][square]
+            blockers = ray & occupied
+            if blockers:
+                if orientation in INCREASING:
+                    nearest = (blockers & -blockers).bit_length() - 1
+                else:
+                    nearest = blockers.bit_length() - 1
+                ray &= ~RAYS[orientation][nearest]
+            reached |= ray
+        return reached & ~occupied, reached & occupied
+
+    def chicken_inheritance(self, square):
+        """
+        The set of piece kinds a Chicken on the square inherits from:
+        every piece next to the Chicken, or next to a Chicken connected to it through a chain of adjacent Chickens.
+        """
+        chickens = self.kind_mask(CHICKEN)
+        cluster = 1 << square
+        while True:
+            grown = cluster | (neighbours(cluster) & chickens)
+            if grown == cluster:
+                break
+            cluster = grown
+        region = cluster | neighbours(cluster)
+        return {kind for kind in range(1, len(PIECE_CLASSES)) if self.kind_mask(kind) & region}
+
+    def dependant_mask(self, pairs, targets):
+        mask = 0
+        occupied = self.occupied
+        for move, dependancy in pairs:
+            if move & targets and not dependancy & occupied:
+                mask |= move
+        return mask
+
+    def moves_mask(self, square):
+        """
+        The empty squares the piece on the square can move to, as a mask.
+        """
+        if self.forced_square is not None and self.forced_square != square:
+            return 0
+        code = self.code_on(square)
+        if code == EMPTY:
+            return 0
+        empty = ~self.occupied & FULL
+        kind = code & KIND_MASK
+        if kind == CHICKEN:
+            return self.chicken_moves_mask(square, code)
+        moves = MOVE_MASKS[code][square] & empty
+        moves |= self.dependant_mask(DEPENDANT_MOVES[code][square], empty)
+        directions = DIRECTION_MOVES[code]
+        if kind == PAWN:
+            start_row, directions = PAWN_SLIDES[code]
+            if square // 10 != start_row:
+                directions = []
+        moves |= self.slide(square, directions)[0]
+        return moves
+
+    def takes_mask(self, square):
+        """
+        The squares the piece on the square can take on, as a mask.
+        """
+        if self.forced_square is not None and self.forced_square != square:
+            return 0
+        code = self.code_on(square)
+        if code == EMPTY:
+            return 0
+        kind = code & KIND_MASK
+        if kind == CHICKEN:
+            return self.chicken_takes_mask(square, code)
+        is_white = is_white_code(code)
+        enemies = self.black if is_white else self.white
+        takes = self.slide(square, DIRECTION_TAKES[code])[1] & enemies & ~self.invulnerable
+        takes |= TAKE_MASKS[code][square] & enemies & ~self.invulnerable
+        # Dependant takes do not check for invulnerability
+        takes |= self.dependant_mask(DEPENDANT_TAKES[code][square], enemies)
+        if kind == PAWN:
+            takes |= self.en_passant_mask(square, is_white)
+        return takes
+
+    def en_passant_mask(self, square, is_white):
+        pawns = self.kind_mask(PAWN) & self.en_passantable
+        mask = 0
+        for pawn, target in EN_PASSANT_CHECKS[is_white][square]:
+            if pawn & pawns:
+                mask |= target
+        return mask
+
+    def chicken_moves_mask(self, square, code):
+        is_white = is_white_code(code)
+        inherited = self.chicken_inheritance(square)
+        empty = ~self.occupied & FULL
+        directions = []
+        if PAWN in inherited and not self.moved & (1 << square):
+            directions.extend(CHICKEN_PAWN_DIRECTIONS[is_white])
+        if ROOK in inherited or QUEEN in inherited:
+            directions.extend(CHICKEN_ROOK_DIRECTIONS)
+        if BISHOP in inherited or QUEEN in inherited:
+            directions.extend(CHICKEN_BISHOP_DIRECTIONS)
+        if BLOB0 in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[0])
+        if BLOB1 in inherited or PANDA in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[1])
+        if BLOB2 in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[2])
+        if BLOB3 in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[3])
+        moves = self.slide(square, directions)[0]
+        # Unlike the takes, the Blob0 dependant moves only look at the squares directly next to the Chicken
+        if self.kind_mask(BLOB0) & neighbours(1 << square):
+            moves |= self.dependant_mask(CHICKEN_BLOB0_DEPENDANT_MOVES[square], empty)
+        if PAWN in inherited:
+            moves |= CHICKEN_PAWN_MOVES[is_white][square] & empty
+        if DOG in inherited or KNIGHT in inherited:
+            moves |= CHICKEN_KNIGHT_MOVES[square] & empty
+        if FROG in inherited:
+            moves |= CHICKEN_FROG_MOVES[square] & empty
+        if PANDA in inherited or KING in inherited:
+            moves |= CHICKEN_KING_MOVES[square] & empty
+        if CLERIC in inherited:
+            moves |= empty
+        return moves
+
+    def chicken_takes_mask(self, square, code):
+        is_white = is_white_code(code)
+        inherited = self.chicken_inheritance(square)
+        enemies = self.black if is_white else self.white
+        vulnerable_enemies = enemies & ~self.invulnerable
+        directions = []
+        if ROOK in inherited or QUEEN in inherited:
+            directions.extend(CHICKEN_ROOK_DIRECTIONS)
+        if BISHOP in inherited or CLERIC in inherited or QUEEN in inherited:
+            directions.extend(CHICKEN_BISHOP_DIRECTIONS)
+        if BLOB0 in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[0])
+        if BLOB1 in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[1])
+        if BLOB2 in inherited or KING in inherited or PANDA in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[2])
+        if BLOB3 in inherited:
+            directions.extend(CHICKEN_BLOB_DIRECTIONS[3])
+        takes = self.slide(square, directions)[1] & vulnerable_enemies
+        if BLOB0 in inherited:
+            takes |= self.dependant_mask(CHICKEN_BLOB0_DEPENDANT_MOVES[square], enemies)
+        if PAWN in inherited:
+            takes |= self.en_passant_mask(square, is_white)
+            takes |= CHICKEN_PAWN_TAKES[is_white][square] & vulnerable_enemies
+        if DOG in inherited or KNIGHT in inherited:
+            takes |= CHICKEN_KNIGHT_MOVES[square] & vulnerable_enemies
+        if FROG in inherited:
+            takes |= CHICKEN_FROG_MOVES[square] & vulnerable_enemies
+        # ChessBoard.legal_takes lets every Chicken take like a King, whatever it is next to
+        takes |= CHICKEN_KING_MOVES[square] & vulnerable_enemies
+        return takes
+
+    def legal_moves(self, position):
+        """
+        The same squares as ChessBoard.legal_moves(position, prevent_checks=False)
+        """
+        row, col = position
+        return positions_in(self.moves_mask(row * 10 + col))
+
+    def legal_takes(self, position):
+        """
+        The same squares as ChessBoard.legal_takes(position, prevent_checks=False)
+        """
+        row, col = position
+        return positions_in(self.takes_mask(row * 10 + col))
+
+    def legal_moves_for_every_piece(self, care_about_colour=True):
+        """
+        Returns every (start_position, end_position) move, without checking if the move would be check.
+        """
+        if care_about_colour:
+            pieces = self.white if self.white_to_move else self.black
+        else:
+            pieces = self.occupied
+        all_moves = []
+        for square in squares_in(pieces):
+            start = divmod(square, 10)
+            for end in squares_in(self.moves_mask(square) | self.takes_mask(square)):
+                all_moves.append((start, divmod(end, 10)))
+        return all_moves
+
+    def attacked_squares(self, pieces):
+        """
+        Every square that one of the pieces in the mask can take on.
+        """
+        attacked = 0
+        for square in squares_in(pieces):
+            attacked |= self.takes_mask(square)
+        return attacked
+
+    def check_check(self, white_in_check):
+        """
+        Checks if any piece can take the king of the given colour, like ChessBoard.check_check with
+        checkDoubleHops=False. A player without a king counts as being in check.
+        """
+        kings = self.boards[piece_code(KING, white_in_check)]
+        if not kings:
+            return True
+        return bool(self.attacked_squares(self.occupied) & kings)
+
+
+CORNERS = (0, 9, 90, 99)
+RANDOM_PIECES = "perdbcqkfpihzxvoy" + "perdbcqkfpihzxvoy".upper()
+
+
+def random_corner_board_state(rng, empty_squares=60):
+    """
+    A random board_state with a piece in every corner, as the shifts are most likely to go wrong at the edges.
+    """
+    board_state = [rng.choice(RANDOM_PIECES + " " * empty_squares) for _ in range(100)]
+    for corner in CORNERS:
+        board_state[corner] = rng.choice(RANDOM_PIECES)
+    return "".join(board_state)
+
+
+def compare_with_board(board):
+    """
+    Builds a BitBoard from a ChessBoard and returns (what, position, BitBoard result, ChessBoard result) for every
+    piece whose moves or takes differ, and for each colour if check_check differs.
+    """
+    bit_board = BitBoard.from_board(board)
+    differences = []
+    for index in board.indices_with_pieces():
+        position = POSITIONS[index]
+        for what, found, expected in (
+                ("moves", bit_board.legal_moves(position), board.legal_moves(position, prevent_checks=False)),
+                ("takes", bit_board.legal_takes(position), board.legal_takes(position, prevent_checks=False))):
+            if sorted(set(found)) != sorted(set(expected)):
+                differences.append((what, position, sorted(found), sorted(expected)))
+    for white_in_check in (True, False):
+        found, expected = bit_board.check_check(white_in_check), board.check_check(white_in_check, False)
+        if found != expected:
+            differences.append(("check", "white" if white_in_check else "black", found, expected))
+    return differences
+
+
+def check_against_board(positions=200, plies=6, seed=0):
+    """
+    Compares the BitBoard with the ChessBoard on random positions with a piece in every corner, and after each of a
+    few random moves from them, so that moved pieces and en passant pawns are covered too. Positions halfway through
+    a double move are skipped. Prints every difference and returns how many there were.
+    """
+    rng = random.Random(seed)
+    difference_count = 0
+    for _ in range(positions):
+        board_state = random_corner_board_state(rng)
+        board = ChessBoard(board_state, rng.random() < 0.5)
+        for ply in range(plies + 1):
+            if board.forced_move is None:
+                for difference in compare_with_board(board):
+                    difference_count += 1
+                    print(repr(board_state), ply, *difference)
+            moves = board.legal_moves_for_every_piece()
+            if not moves:
+                break
+            board.move_piece(*rng.choice(moves))
+    return difference_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks the BitBoard against the ChessBoard on random positions.")
+    parser.add_argument("--positions", type=int, default=200, help="the number of random positions to start from")
+    parser.add_argument("--plies", type=int, default=6, help="the random moves to play from each one")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    differences = check_against_board(arguments.positions, arguments.plies, arguments.seed)
+    print(f"{differences} difference(s)")
+    if differences:
+        sys.exit(1)
@@ -3,7 +3,12 @@ import numpy as np
 
 import pygame
 from Pieces import *
+from PieceCodes import *
+from MoveTables import *
+from Zobrist import *
 
+# The most results double_hop_cache holds before it is emptied
+DOUBLE_HOP_CACHE_SIZE = 10000
 
 class ChessBoard:
     """
@@ -37,11 +42,29 @@ class ChessBoard:
         self.moves = []
         self.forced_move = None
         self.checked_positions = []
-        self.previous_board_states = []
-        self.squares = []
+        self.undo_stack = []
+        self.journal = None
+        # The last result of legality_info, and the position and colour it was for
+        self.legality_key = None
+        self.legality = None
+        # The legal moves of the forced_move piece, worked out by the last move_piece that gave a piece a second move
+        self.second_moves = []
+        # Results of is_legal_double_hop, keyed by (board_hash, start index, end index)
+        self.double_hop_cache = {}
+        self.mailbox = bytearray(EMPTY_MAILBOX)
+        self.flags = bytearray(SIZE)
+        self.piece_cache = [None] * SIZE
 
         self.set_board_state(board_state)
 
+    @property
+    def squares(self):
+        """
+        The board as a 10x10 list of lists, holding a Piece object or None for every square.
+        The pieces actually live in self.mailbox, so this is only a view for code that wants to work with Piece objects.
+        """
+        return [[self.square_in_position((row, col)) for col in range(10)] for row in range(10)]
+
     def board_state(self):
         """
         The board_state is a 100 character string representing the current board.
@@ -50,115 +73,104 @@ class ChessBoard:
         There is a unique letter for pieces like an immortal panda or chicken,
          or a pawn who is enpassantable on the next move.
         """
-        board_state = ""
-        for row in self.squares:
-            for square in row:
-                if issubclass(type(square), Piece):
-                    board_state += square.as_char()
-                else:
-                    board_state += " "
-        return board_state
+        mailbox, flags = self.mailbox, self.flags
+        return "".join([code_char(mailbox[index], flags[index]) for index in INDICES])
 
     def set_board_state(self, board_state):
         """
         Takes in a board_state as a parameter, and edits the squares such that they match the board_state that is passed in.
         Primarily called during self.__init__()
         """
-        self.squares = [[None for j in range(10)] for i in range(10)]
-        position = [0, 0]
-        for char in board_state:
-            if char.lower() == char:
-                is_white = True
-            else:
-                is_white = False
-
-            piece = None
-            if char is None:
-                pass
-            elif char.lower() == "p":
-                piece = Pawn(is_white, (position[0], position[1]))
-                if (position[0] == 1 and not is_white) or (position[0] == 8 and is_white):
-                    piece.has_moved = True
-            elif char.lower() == "e":
-                piece = Pawn(is_white, (position[0], position[1]))
-                piece.is_en_passantable = True
-            elif char.lower() == "r":
-                piece = Rook(is_white, (position[0], position[1]))
-            elif char.lower() == "m":
-                piece = Rook(is_white, (position[0], position[1]))
-                piece.has_moved = True
-            elif char.lower() == "n":
-                piece = Knight(is_white, (position[0], position[1]))
-            elif char.lower() == "d":
-                piece = Dog(is_white, (position[0], position[1]))
-            elif char.lower() == "f":
-                piece = Frog(is_white, (position[0], position[1]))
-            elif char.lower() == "z":
-                piece = Blob0(is_white, (position[0], position[1]))
-            elif char.lower() == "x":
-                piece = Blob1(is_white, (position[0], position[1]))
-            elif char.lower() == "v":
-                piece = Blob2(is_white, (position[0], position[1]))
-            elif char.lower() == "j":
-                piece = Blob3(is_white, (position[0], position[1]))
-            elif char.lower() == "q":
-                piece = Queen(is_white, (position[0], position[1]))
-            elif char.lower() == "a":
-                piece = Panda(is_white, (position[0], position[1]))
-            elif char.lower() == "i":
-                piece = Panda(is_white, (position[0], position[1]))
-                piece.invulnerable = True
-            elif char.lower() == "h":
-                piece = Chicken(is_white, (position[0], position[1]))
-                piece.has_moved = True
-            elif char.lower() == "y":
-                piece = Chicken(is_white, (position[0], position[1]))
-                piece.invulnerable = True
-                piece.has_moved = True
-            elif char.lower() == "o":
-                piece = Chicken(is_white, (position[0], position[1]))
-                piece.has_moved = False
-            elif char.lower() == "g":
-                piece = Egg(is_white, (position[0], position[1]))
-            elif char.lower() == "b":
-                piece = Bishop(is_white, (position[0], position[1]))
-            elif char.lower() == "c":
-                piece = Cleric(is_white, (position[0], position[1]))
-            elif char.lower() == "k":
-                piece = King(is_white, (position[0], position[1]))
-            elif char == "(":
-                piece = King(True, (position[0], position[1]))
-                piece.has_moved = True
-            elif char == ")":
-                piece = King(False, (position[0], position[1]))
-                piece.has_moved = True
-            elif char.lower() == "q":
-                piece = Dog(is_white, (position[0], position[1]))
-                self.forced_move = piece
-            elif char.lower() == "w":
-                piece = Chicken(is_white, (position[0], position[1]))
-                self.forced_move = piece
-            elif char.lower() == "#":
-                piece = Wall(is_white, (position[0], position[1]))
-            elif char in ["5", "4", "3", "2", "1"]:
-                piece = Egg(True, (position[0], position[1]))
-                piece.char_to_hatch_time(char)
-            elif char in ["%", "$", "£", '"', "!"]:
-                piece = Egg(False, (position[0], position[1]))
-                piece.char_to_hatch_time(char)
-            elif char == "8":
-                piece = Death(True, (position[0], position[1]))
-            elif char == "*":
-                piece = Death(False, (position[0], position[1]))
-            else:
-                piece = None
-
-            self.squares[position[0]][position[1]] = piece
+        self.mailbox = bytearray(EMPTY_MAILBOX)
+        self.flags = bytearray(SIZE)
+        self.piece_cache = [None] * SIZE
+        # The results of adjacent_indices, by start index, and for each square the start indices whose result it is in
+        self.adjacency_cache = {}
+        self.adjacency_watchers = {}
+        # The undo stack only holds changes to the squares, which mean nothing once the whole board has been replaced
+        self.undo_stack = []
+        self.journal = None
+        for index, char in zip(INDICES, board_state):
+            if char not in CHAR_CODES:
+                continue
+            code, flags = CHAR_CODES[char]
+            if char in "pP" and POSITIONS[index][0] == (8 if is_white_code(code) else 1):
+                flags = HAS_MOVED
+            self.mailbox[index] = code
+            self.flags[index] = flags
+            if char in "wW":
+                self.forced_move = self.square_in_position(POSITIONS[index])
+        self.board_hash = hash_mailbox(self.mailbox, self.flags)
+        # The indices of the squares holding each code, so that pieces can be found without looking at every square
+        self.piece_indices = [set() for _ in range(2 * BLACK)]
+        # The indices of the pieces with a timer that tick_all_pieces has to run
+        self.ticking_indices = set()
+        # The running totals of VALUES for each colour, indexed by is_white, and the first 100 entries of features
+        self.material = [0, 0]
+        self.feature_vector = np.zeros(101)
+        for index in INDICES:
+            code = self.mailbox[index]
+            if code != EMPTY:
+                self.piece_indices[code].add(index)
+                if self.flags[index] & TIMERS and code & KIND_MASK != WALL:
+                    self.ticking_indices.add(index)
+                self.material[not code & BLACK] += VALUES[code]
+                self.feature_vector[SQUARE_NUMBERS[index]] = FEATURE_INTS[code]
+
+    def copy(self, history=True):
+        """
+        Returns a new ChessBoard in the same position, with the same forced_move, without going through a board_state.
+        If history is True, the new board also gets the moves made so far, and can undo them like this board can.
+
+        Piece objects are not copied: the new board builds its own from the mailbox when its squares are first asked
+        for, so changing a piece on one board never changes the other. A GameBoard is copied into a plain ChessBoard.
+        """
+        board = ChessBoard.__new__(ChessBoard)
+        board.white_to_move = self.white_to_move
+        board.selected_piece = None
+        board.current_legal_moves = []
+        board.victor = self.victor
+        board.checked_positions = []
+        board.legality_key = self.legality_key
+        board.legality = self.legality
+        board.second_moves = list(self.second_moves)
+        board.double_hop_cache = {}
+        board.mailbox = bytearray(self.mailbox)
+        board.flags = bytearray(self.flags)
+        board.piece_cache = [None] * SIZE
+        board.board_hash = self.board_hash
+        board.piece_indices = [set(indices) for indices in self.piece_indices]
+        board.ticking_indices = set(self.ticking_indices)
+        board.material = list(self.material)
+        board.feature_vector = self.feature_vector.copy()
+        board.adjacency_cache = dict(self.adjacency_cache)
+        board.adjacency_watchers = {index: set(starts) for index, starts in self.adjacency_watchers.items()}
+        board.forced_move = None if self.forced_move is None else board.square_in_position(self.forced_move.position)
+        if history:
+            board.moves = [move[:] for move in self.moves]
+            board.undo_stack = [(list(changes), forced_position, white_to_move)
+                                for changes, forced_position, white_to_move in self.undo_stack]
+            # Changes are still being added to the last move, if it has not finished
+            is_open = self.undo_stack and self.journal is self.undo_stack[-1][0]
+            board.journal = board.undo_stack[-1][0] if is_open else None
+        else:
+            board.moves = []
+            board.undo_stack = []
+            board.journal = None
+        return board
 
-            if position[1] == 9:
-                position = [position[0] + 1, 0]
-            else:
-                position[1] += 1
+    def normalise(self):
+        """
+        Makes the board the same as a new ChessBoard made from its board_state(): there is no forced move, and flags
+        that a board_state cannot show (like a Death being invulnerable) are cleared.
+        """
+        self.forced_move = None
+        mailbox, flags = self.mailbox, self.flags
+        for index in self.indices_with_pieces():
+            code = mailbox[index]
+            new_code, new_flags = board_state_square(code, flags[index], POSITIONS[index][0])
+            if new_code != code or new_flags != flags[index]:
+                self.set_index(index, new_code, new_flags)
 
     def square_in_position(self, position):
         """
@@ -168,32 +180,106 @@ class ChessBoard:
 
         Returns the object located in the square. If the square is out of bounds for the board, e.g. (11, -3),
         returns None
+
+        Piece objects are only built when a square is first asked for, and are then kept in self.piece_cache until
+        the square changes.
         """
 
         row, col = position
         if not 0 <= row <= 9 or not 0 <= col <= 9:
             return None
-        return self.squares[position[0]][position[1]]
+        index = (row + PADDING) * WIDTH + col + PADDING
+        code = self.mailbox[index]
+        if code == EMPTY:
+            return None
+        piece = self.piece_cache[index]
+        if piece is None:
+            piece = self.piece_cache[index] = decode(code, self.flags[index], (row, col))
+        return piece
 
     def set_square_in_position(self, position, new_square_value):
         """
         Sets the square in the specified position to the new for the square to be changed to.
+        Any changes made to a Piece object after it has been placed need to be placed again to reach the mailbox.
         """
         row, col = position
         if 0 <= row <= 9 and 0 <= col <= 9:
-            self.squares[row][col] = new_square_value
+            index = (row + PADDING) * WIDTH + col + PADDING
+            if new_square_value is None:
+                self.set_index(index, EMPTY, 0)
+            else:
+                code, flags = encode(new_square_value)
+                self.set_index(index, code, flags, new_square_value)
+
+    def set_index(self, index, code, flags, piece=None):
+        """
+        Every change to a square on the board goes through this method.
+        While a move is being made, the old contents of the square are added to self.journal so that undo_move can put
+        them back.
+        piece is the Piece object for the new contents, if there already is one.
+        """
+        old_code, old_flags = self.mailbox[index], self.flags[index]
+        if self.journal is not None:
+            self.journal.append((index, old_code, old_flags))
+        if code != old_code:
+            self.code_changed(index, old_code, code)
+        if (flags | old_flags) & TIMERS:
+            if flags & TIMERS and code & KIND_MASK != WALL:
+                self.ticking_indices.add(index)
+            else:
+                self.ticking_indices.discard(index)
+        self.board_hash ^= square_key(index, old_code, old_flags) ^ square_key(index, code, flags)
+        self.mailbox[index] = code
+        self.flags[index] = flags
+        self.piece_cache[index] = piece
+
+    def poke(self, index, code, flags):
+        """
+        Changes a square without journalling or hashing the change, for looking at a position for a moment before
+        putting the square straight back. piece_indices and adjacency_cache still follow the change.
+        """
+        old_code = self.mailbox[index]
+        if code != old_code:
+            self.code_changed(index, old_code, code)
+        self.mailbox[index] = code
+        self.flags[index] = flags
+
+    def code_changed(self, index, old_code, code):
+        """
+        Keeps piece_indices, adjacency_cache, material and feature_vector up to date when the code on a square changes.
+        """
+        if old_code != EMPTY:
+            self.piece_indices[old_code].discard(index)
+            self.material[not old_code & BLACK] -= VALUES[old_code]
+        if code != EMPTY:
+            self.piece_indices[code].add(index)
+            self.material[not code & BLACK] += VALUES[code]
+        self.feature_vector[SQUARE_NUMBERS[index]] = FEATURE_INTS[code]
+        if index in self.adjacency_watchers:
+            self.forget_adjacency(index)
+
+    def code_in_position(self, position):
+        """
+        Returns the mailbox code for a position, which is OFF_BOARD for positions that are out of bounds for the board.
+        """
+        row, col = position
+        if not 0 <= row <= 9 or not 0 <= col <= 9:
+            return OFF_BOARD
+        return self.mailbox[(row + PADDING) * WIDTH + col + PADDING]
 
     def find_pieces(self, is_white, piece_type):
         """
         Returns a list of positions for any piece that fits the parameters
         """
-        pieces = []
-        for row in self.squares:
-            for square in row:
-                if square is not None:
-                    if square.is_white == is_white and issubclass(type(square), piece_type):
-                        pieces.append(square.position)
-        return pieces
+        piece_indices = self.piece_indices
+        indices = [index for code in codes_of(is_white, piece_type) for index in piece_indices[code]]
+        return [POSITIONS[index] for index in sorted(indices)]
+
+    def king_indices(self, is_white):
+        """
+        The mailbox indices of the Kings of one colour.
+        """
+        return sorted(self.piece_indices[piece_code(KING, is_white)])
 
     def legal_moves_for_every_piece(self, care_about_colour=True, prefer_pieces=None):
         """
@@ -208,21 +294,65 @@ class ChessBoard:
 
         invertColour means that if it is Black's turn, only white pieces' moves will be considered.
         """
-        all_pieces = []
-        for row in self.squares:
-            for square in row:
-                if issubclass(type(square), Piece):
-                    all_pieces.append(square)
-        if care_about_colour:
-            all_pieces = [piece for piece in all_pieces if piece.is_white == self.white_to_move]
+        positions = [POSITIONS[index] for index in self.indices_with_pieces(care_about_colour)]
         if prefer_pieces is not None:
-            all_pieces = [piece for piece in all_pieces if piece in prefer_pieces]
+            positions = [position for position in positions if self.square_in_position(position) in prefer_pieces]
         all_moves = []
-        for piece in all_pieces:
-            for move in self.all_legal_moves(piece.position):
-                all_moves.append((piece.position, move))
+        for position in positions:
+            for move in self.all_legal_moves(position):
+                all_moves.append((position, move))
         return all_moves
 
+    def iter_legal_moves(self, care_about_colour=True, prefer_pieces=None):
+        """
+        Yields the same (start_position, end_position) moves as legal_moves_for_every_piece, but one at a time.
+        Pieces whose moves are cheapest to check come first, so that callers that only need to know if there is a move
+        can stop early.
+        """
+        mailbox = self.mailbox
+        indices = sorted(self.indices_with_pieces(care_about_colour),
+                         key=lambda index: GENERATION_COST[mailbox[index] & KIND_MASK])
+        double_hop_start_positions = None
+        for index in indices:
+            position = POSITIONS[index]
+            if prefer_pieces is not None and self.square_in_position(position) not in prefer_pieces:
+                continue
+            for move in self.legal_moves(position, False):
+                if not self.would_be_check(self.white_to_move, (position, move)):
+                    yield position, move
+            takes = self.legal_takes(position, False)
+            if takes:
+                if double_hop_start_positions is None:
+                    double_hop_start_positions = self.double_hop_start_positions()
+                if position in double_hop_start_positions:
+                    for move in self.legal_double_hops(position, takes):
+                        yield position, move
+                else:
+                    for move in takes:
+                        if not self.would_be_check(self.white_to_move, (position, move)):
+                            yield position, move
+            if mailbox[index] & KIND_MASK == KING:
+                for move in self.castle_moves(self.square_in_position(position)):
+                    yield position, move
+
+    def has_any_legal_move(self, care_about_colour=True):
+        """
+        Checks if there is at least one legal move, stopping at the first one found.
+        """
+        return next(self.iter_legal_moves(care_about_colour), None) is not None
+
+    def indices_with_pieces(self, care_about_colour=False):
+        """
+        Returns the mailbox indices of the squares that hold a piece.
+        If care_about_colour is True, only the pieces belonging to the player whose turn it is are included.
+        """
+        piece_indices = self.piece_indices
+        if not care_about_colour:
+            codes = COLOUR_CODES[True] + COLOUR_CODES[False]
+        else:
+            codes = COLOUR_CODES[self.white_to_move]
+        return sorted([index for code in codes for index in piece_indices[code]])
+
     def all_legal_moves(self, position, prevent_checks=True):
         """
         Gets the legal moves and takes for a piece in a given position, regardless of whose turn it is.
@@ -242,38 +372,34 @@ class ChessBoard:
         if self.forced_move is not None:
             if not self.forced_move.position == position:
                 return []
-        target_square = self.square_in_position(position)
-        if target_square is None:
+        code = self.code_in_position(position)
+        if code == EMPTY or code == OFF_BOARD:
             return []
 
-        legal_moves = []
-        legal_moves.extend(self.legal_moves_from_directions(target_square))
-        legal_moves.extend([position for position in target_square.moves() if self.is_legal_move(position)])
-        legal_moves.extend(self.legal_moves_from_dependancies(target_square))
+        mailbox = self.mailbox
+        index = to_index(position)
+        adjacent_pieces = self.adjacent_piece_types(position) if code & KIND_MASK == CHICKEN else None
+        legal_moves = self.legal_moves_from_directions(index, adjacent_pieces)
+        legal_moves.extend([POSITIONS[move] for move in MOVES[code][index] if mailbox[move] == EMPTY])
+        legal_moves.extend(self.legal_moves_from_dependancies(index))
 
-        if type(target_square) == Chicken:
-            adjacent_pieces = self.adjacent_piece_types(target_square.position)
+        if adjacent_pieces is not None:
+            hops = []
             if Pawn in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.pawn_moves()
-                                    if self.is_legal_move(position)])
+                hops.extend(CHICKEN_PAWN_MOVES[code][index])
             if Dog in adjacent_pieces or Knight in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.knight_moves()
-                                    if self.is_legal_move(position)])
+                hops.extend(CHICKEN_KNIGHT_MOVES[index])
             if Frog in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.frog_moves()
-                                    if self.is_legal_move(position)])
+                hops.extend(CHICKEN_FROG_MOVES[index])
             if Panda in adjacent_pieces or King in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.king_moves()
-                                    if self.is_legal_move(position)])
+                hops.extend(CHICKEN_KING_MOVES[index])
             if Cleric in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.cleric_moves()
-                                    if self.is_legal_move(position)])
-        try:
-            legal_moves = list(
-                {(row, col) for (row, col) in legal_moves if 0 <= row <= 9 and 0 <= col <= 9 and (row, col) !=
-                 self.find_pieces(is_white=not target_square.is_white, piece_type=King)[0]})
-        except IndexError:
-            pass
+                hops.extend(CHICKEN_CLERIC_MOVES[index])
+            legal_moves.extend([POSITIONS[move] for move in hops if mailbox[move] == EMPTY])
+        enemy_kings = self.king_indices(not is_white_code(code))
+        if enemy_kings:
+            enemy_king = POSITIONS[enemy_kings[0]]
+            legal_moves = list({move for move in legal_moves if move != enemy_king})
         if prevent_checks:
             legal_moves = [move for move in legal_moves if
                            not self.would_be_check(self.white_to_move, (position, move))]
@@ -286,278 +412,254 @@ class ChessBoard:
         if self.forced_move is not None:
             if not self.forced_move.position == position:
                 return []
-        target_square = self.square_in_position(position)
-        if target_square is None:
+        code = self.code_in_position(position)
+        if code == EMPTY or code == OFF_BOARD:
             return []
 
-        legal_moves = []
-        legal_moves.extend(self.legal_takes_from_directions(target_square))
-        legal_moves.extend([position for position in target_square.takes()
-                            if self.is_legal_take(position, is_white=target_square.is_white)])
-        legal_moves.extend(self.legal_takes_from_dependancies(target_square))
-        if type(target_square) == Chicken:
-            adjacent_pieces = self.adjacent_piece_types(target_square.position)
-        else:
-            adjacent_pieces = []
-        if type(target_square) == Pawn or (
-                type(target_square) == Chicken and Pawn in adjacent_pieces):
-            if target_square.is_white:
-                if target_square.position[0] == 3:
-                    row, col = target_square.position
-                    if type(self.square_in_position((row, col - 1))) == Pawn:
-                        if self.square_in_position((row, col - 1)).is_en_passantable:
-                            legal_moves.append((row - 1, col - 1))
-                    if type(self.square_in_position((row, col + 1))) == Pawn:
-                        if self.square_in_position((row, col + 1)).is_en_passantable:
-                            legal_moves.append((row - 1, col + 1))
-                    if type(self.square_in_position((row + 1, col - 1))) == Pawn:
-                        if self.square_in_position((row + 1, col - 1)).is_en_passantable:
-                            legal_moves.append((row - 1, col - 1))
-                    if type(self.square_in_position((row + 1, col + 1))) == Pawn:
-                        if self.square_in_position((row + 1, col + 1)).is_en_passantable:
-                            legal_moves.append((row - 1, col + 1))
-                elif target_square.position[0] == 4:
-                    row, col = target_square.position
-                    if type(self.square_in_position((row, col - 1))) == Pawn:
-                        if self.square_in_position((row, col - 1)).is_en_passantable:
-                            legal_moves.append((row - 1, col - 1))
-                    if type(self.square_in_position((row, col + 1))) == Pawn:
-                        if self.square_in_position((row, col + 1)).is_en_passantable:
-                            legal_moves.append((row - 1, col + 1))
+        is_white = is_white_code(code)
+        index = to_index(position)
+        adjacent_pieces = self.adjacent_piece_types(position) if code & KIND_MASK == CHICKEN else None
+        legal_moves = self.legal_takes_from_directions(index, adjacent_pieces)
+        legal_moves.extend([POSITIONS[move] for move in TAKES[code][index] if self.is_legal_index_take(move, is_white)])
+        legal_moves.extend(self.legal_takes_from_dependancies(index, adjacent_pieces))
+        if code & KIND_MASK == PAWN or (adjacent_pieces is not None and Pawn in adjacent_pieces):
+            row, col = position
+            if is_white:
+                if row == 3:
+                    if self.is_en_passantable_pawn((row, col - 1)):
+                        legal_moves.append((row - 1, col - 1))
+                    if self.is_en_passantable_pawn((row, col + 1)):
+                        legal_moves.append((row - 1, col + 1))
+                    if self.is_en_passantable_pawn((row + 1, col - 1)):
+                        legal_moves.append((row - 1, col - 1))
+                    if self.is_en_passantable_pawn((row + 1, col + 1)):
+                        legal_moves.append((row - 1, col + 1))
+                elif row == 4:
+                    if self.is_en_passantable_pawn((row, col - 1)):
+                        legal_moves.append((row - 1, col - 1))
+                    if self.is_en_passantable_pawn((row, col + 1)):
+                        legal_moves.append((row - 1, col + 1))
             else:
-                if target_square.position[0] == 6:
-                    row, col = target_square.position
-                    if type(self.square_in_position((row, col - 1))) == Pawn:
-                        if self.square_in_position((row, col - 1)).is_en_passantable:
-                            legal_moves.append((row + 1, col - 1))
-                    if type(self.square_in_position((row, col + 1))) == Pawn:
-                        if self.square_in_position((row, col + 1)).is_en_passantable:
-                            legal_moves.append((row + 1, col + 1))
-                    if type(self.square_in_position((row - 1, col - 1))) == Pawn:
-                        if self.square_in_position((row - 1, col - 1)).is_en_passantable:
-                            legal_moves.append((row + 1, col - 1))
-                    if type(self.square_in_position((row - 1, col + 1))) == Pawn:
-                        if self.square_in_position((row - 1, col + 1)).is_en_passantable:
-                            legal_moves.append((row + 1, col + 1))
-                elif target_square.position[0] == 5:
-                    row, col = target_square.position
-                    if type(self.square_in_position((row, col - 1))) == Pawn:
-                        if self.square_in_position((row, col - 1)).is_en_passantable:
-                            legal_moves.append((row + 1, col - 1))
-                    if type(self.square_in_position((row, col + 1))) == Pawn:
-                        if self.square_in_position((row, col + 1)).is_en_passantable:
-                            legal_moves.append((row + 1, col + 1))
-        if type(target_square) == Chicken:
+                if row == 6:
+                    if self.is_en_passantable_pawn((row, col - 1)):
+                        legal_moves.append((row + 1, col - 1))
+                    if self.is_en_passantable_pawn((row, col + 1)):
+                        legal_moves.append((row + 1, col + 1))
+                    if self.is_en_passantable_pawn((row - 1, col - 1)):
+                        legal_moves.append((row + 1, col - 1))
+                    if self.is_en_passantable_pawn((row - 1, col + 1)):
+                        legal_moves.append((row + 1, col + 1))
+                elif row == 5:
+                    if self.is_en_passantable_pawn((row, col - 1)):
+                        legal_moves.append((row + 1, col - 1))
+                    if self.is_en_passantable_pawn((row, col + 1)):
+                        legal_moves.append((row + 1, col + 1))
+        if adjacent_pieces is not None:
+            hops = []
             if Pawn in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.pawn_takes()
-                                    if self.is_legal_take(position, target_square.is_white)])
+                hops.extend(CHICKEN_PAWN_TAKES[code][index])
             if Dog in adjacent_pieces or Knight in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.knight_moves()
-                                    if self.is_legal_take(position, target_square.is_white)])
+                hops.extend(CHICKEN_KNIGHT_MOVES[index])
             if Frog in adjacent_pieces:
-                legal_moves.extend([position for position in target_square.frog_moves()
-                                    if self.is_legal_take(position, target_square.is_white)])
+                hops.extend(CHICKEN_FROG_MOVES[index])
             if King in adjacent_pieces or Panda:
-                legal_moves.extend([position for position in target_square.king_moves()
-                                    if self.is_legal_take(position, target_square.is_white)])
+                hops.extend(CHICKEN_KING_MOVES[index])
+            legal_moves.extend([POSITIONS[move] for move in hops if self.is_legal_index_take(move, is_white)])
         legal_moves = list({(row, col) for (row, col) in legal_moves if 0 <= row <= 9 and 0 <= col <= 9})
         if prevent_checks:
             if position in self.double_hop_start_positions():
-                valid_moves = []
-                for move in legal_moves:
-                    new_board = ChessBoard(self.board_state(), self.white_to_move)
-                    new_board.double_move_piece(position, move)
-                    for doubleMove in new_board.all_legal_moves(move, False):
-                        newer_board = ChessBoard(new_board.board_state(), new_board.white_to_move)
-                        newer_board.double_move_piece(move, doubleMove)
-                        is_check_after_two_moves = newer_board.check_check(target_square.is_white)
-                        del newer_board
-                        if not is_check_after_two_moves:
-                            valid_moves.append(move)
-                    del new_board
-                    legal_moves = valid_moves
+                legal_moves = self.legal_double_hops(position, legal_moves)
             else:
                 legal_moves = [move for move in legal_moves if
                                not self.would_be_check(self.white_to_move, (position, move))]
         return legal_moves
 
+    def is_legal_double_hop(self, position, move):
+        """
+        A take by a piece that moves twice is legal if there is a second move after which its player is not in check.
+        """
+        return move in self.legal_double_hops(position, [move])
+
+    def legal_double_hops(self, position, takes):
+        """
+        Returns the takes from a position that are legal for a piece that moves twice.
+        Every take and second move is tried out on this board, all in one trial, and undone afterwards. The results are
+        kept in double_hop_cache, so that the same take is only tried once for each position.
+        """
+        cache = self.double_hop_cache
+        start = to_index(position)
+        untried = [take for take in takes if (self.board_hash, start, to_index(take)) not in cache]
+        if untried:
+            if len(cache) > DOUBLE_HOP_CACHE_SIZE:
+                cache.clear()
+            keys = [(self.board_hash, start, to_index(take)) for take in untried]
+            is_white = is_white_code(self.mailbox[start])
+            saved = self.begin_trial()
+            trial_start = len(self.journal)
+            for key, take in zip(keys, untried):
+                self.shift_piece(start, key[2])
+                is_legal = False
+                for doubleMove in self.all_legal_moves(take, False):
+                    length = len(self.journal)
+                    self.shift_piece(key[2], to_index(doubleMove))
+                    is_legal = not ChessBoard.check_check(self, is_white)
+                    self.rewind_journal(length)
+                    if is_legal:
+                        break
+                self.rewind_journal(trial_start)
+                cache[key] = is_legal
+            self.end_trial(saved)
+        return [take for take in takes if cache.get((self.board_hash, start, to_index(take)))]
+
     def is_legal_move(self, end_position):
         """
         Checks if the end position for any given move is legal.
         For a move to be legal, it has to be unoccupied previously to the move.
         """
-        if not (0 <= end_position[0] <= 9 and 0 <= end_position[1] <= 9):
-            return False
-        if self.square_in_position(end_position) is None:
-            return True
-        else:
-            return False
+        return self.code_in_position(end_position) == EMPTY
 
     def is_legal_take(self, end_position, is_white):
         """
         Checks if the end position for any given move is legal.
         For a move to be legal, it has to be occupied by an enemy piece previously to the move.
         """
-        if not (0 <= end_position[0] <= 9 and 0 <= end_position[1] <= 9):
+        row, col = end_position
+        if not (0 <= row <= 9 and 0 <= col <= 9):
             return False
-        target_square = self.square_in_position(end_position)
-        if issubclass(type(target_square), Piece) and target_square.is_white \
-                is not is_white and not target_square.invulnerable:
-            return True
-        else:
+        return self.is_legal_index_take((row + PADDING) * WIDTH + col + PADDING, is_white)
+
+    def is_legal_index_take(self, index, is_white):
+        """
+        The same as is_legal_take, for a mailbox index that is already known to be on the board.
+        """
+        code = self.mailbox[index]
+        return code != EMPTY and is_white_code(code) is not is_white and not self.flags[index] & INVULNERABLE
+
+    def is_en_passantable_pawn(self, position):
+        """
+        Checks if there is a Pawn that can be taken en passant in the given position.
+        """
+        row, col = position
+        if not (0 <= row <= 9 and 0 <= col <= 9):
             return False
+        index = (row + PADDING) * WIDTH + col + PADDING
+        return self.mailbox[index] & KIND_MASK == PAWN and self.flags[index] & EN_PASSANTABLE != 0
 
-    def legal_moves_from_directions(self, piece):
+    def legal_moves_from_directions(self, index, adjacent_pieces=None):
         """
-        Calculates the legal moves for sliding pieces such as bishops and rooks.
+        Calculates the legal moves for sliding pieces such as bishops and rooks, from the piece at the mailbox index.
         Returns this as a list of available positions
+
+        adjacent_pieces is only used for Chickens, and is worked out here if it is not passed in.
         """
-        legal_moves = []
-        if type(piece) == Chicken:
-            directions = []
-            adjacent_pieces = self.adjacent_piece_types(piece.position)
-            if Pawn in adjacent_pieces:
-                directions.extend(piece.pawn_direction_moves())
+        mailbox = self.mailbox
+        code = mailbox[index]
+        if code & KIND_MASK == CHICKEN:
+            if adjacent_pieces is None:
+                adjacent_pieces = self.adjacent_piece_types(POSITIONS[index])
+            rays = []
+            if Pawn in adjacent_pieces and not self.flags[index] & HAS_MOVED:
+                rays.extend(CHICKEN_PAWN_RAYS[code][index])
             if Rook in adjacent_pieces:
-                directions.extend(piece.rook_direction_moves())
+                rays.extend(CHICKEN_ROOK_RAYS[index])
             if Bishop in adjacent_pieces:
-                directions.extend(piece.bishop_direction_moves())
+                rays.extend(CHICKEN_BISHOP_RAYS[index])
             if Queen in adjacent_pieces:
-                directions.extend(piece.rook_direction_moves())
-                directions.extend(piece.bishop_direction_moves())
+                rays.extend(CHICKEN_ROOK_RAYS[index])
+                rays.extend(CHICKEN_BISHOP_RAYS[index])
             if Blob0 in adjacent_pieces:
-                directions.extend(piece.blob0_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[0][index])
             if Blob1 in adjacent_pieces or Panda in adjacent_pieces:
-                directions.extend(piece.blob1_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[1][index])
             if Blob2 in adjacent_pieces:
-                directions.extend(piece.blob2_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[2][index])
             if Blob3 in adjacent_pieces:
-                directions.extend(piece.blob3_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[3][index])
         else:
-            directions = piece.direction_moves()
-        position = piece.position
-        for orientation, limit in directions:
-            found_piece = False
-            squares_travelled = 0
-            movement = [0, 0]
-            current_position = position
-
-            if "N" in orientation:
-                movement[0] = -1
-            elif "S" in orientation:
-                movement[0] = +1
-
-            if "E" in orientation:
-                movement[1] = 1
-            elif "W" in orientation:
-                movement[1] = -1
-
-            while not found_piece and squares_travelled < limit:
-                squares_travelled += 1
-                current_position = current_position[0] + movement[0], current_position[1] + movement[1]
-                try:
-                    currentSquare = self.square_in_position(current_position)
-                except IndexError:
+            rays = MOVE_RAYS[code][index]
+        legal_moves = []
+        for ray in rays:
+            for target in ray:
+                if mailbox[target] != EMPTY:
                     break
-                if currentSquare is not None:
-                    found_piece = True
-                else:
-                    legal_moves.append(current_position)
+                legal_moves.append(POSITIONS[target])
         return legal_moves
 
-    def legal_takes_from_directions(self, piece):
+    def legal_takes_from_directions(self, index, adjacent_pieces=None):
         """
-        Calculates the legal takes for sliding pieces such as bishops and rooks.
+        Calculates the legal takes for sliding pieces such as bishops and rooks, from the piece at the mailbox index.
         Returns this as a list of available positions
         """
-        legal_moves = []
-        if type(piece) == Chicken:
-            directions = []
-            adjacent_pieces = self.adjacent_piece_types(piece.position)
+        mailbox = self.mailbox
+        code = mailbox[index]
+        if code & KIND_MASK == CHICKEN:
+            if adjacent_pieces is None:
+                adjacent_pieces = self.adjacent_piece_types(POSITIONS[index])
+            rays = []
             if Rook in adjacent_pieces:
-                directions.extend(piece.rook_direction_moves())
+                rays.extend(CHICKEN_ROOK_RAYS[index])
             if Bishop in adjacent_pieces or Cleric in adjacent_pieces:
-                directions.extend(piece.bishop_direction_moves())
+                rays.extend(CHICKEN_BISHOP_RAYS[index])
             if Queen in adjacent_pieces:
-                directions.extend(piece.rook_direction_moves())
-                directions.extend(piece.bishop_direction_moves())
+                rays.extend(CHICKEN_ROOK_RAYS[index])
+                rays.extend(CHICKEN_BISHOP_RAYS[index])
             if Blob0 in adjacent_pieces:
-                directions.extend(piece.blob0_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[0][index])
             if Blob1 in adjacent_pieces:
-                directions.extend(piece.blob1_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[1][index])
             if Blob2 in adjacent_pieces or King in adjacent_pieces or Panda in adjacent_pieces:
-                directions.extend(piece.blob2_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[2][index])
             if Blob3 in adjacent_pieces:
-                directions.extend(piece.blob3_direction_moves())
+                rays.extend(CHICKEN_BLOB_RAYS[3][index])
         else:
-            directions = piece.direction_takes()
-        for orientation, limit in directions:
-            found_piece = False
-            squares_travelled = 0
-            movement = [0, 0]
-            current_position = piece.position
-
-            if "N" in orientation:
-                movement[0] = 1
-            elif "S" in orientation:
-                movement[0] = -1
-
-            if "E" in orientation:
-                movement[1] = 1
-            elif "W" in orientation:
-                movement[1] = -1
-
-            while not found_piece and squares_travelled < limit:
-                squares_travelled += 1
-                current_position = current_position[0] + movement[0], current_position[1] + movement[1]
-                if not (0 <= current_position[0] <= 9 and 0 <= current_position[1] <= 9):
-                    break
-                currentSquare = self.square_in_position(current_position)
-                if currentSquare is not None:
-                    found_piece = True
-                    if currentSquare.is_white != piece.is_white and not currentSquare.invulnerable:
-                        legal_moves.append(current_position)
+            rays = TAKE_RAYS[code][index]
+        flags = self.flags
+        colour = code & BLACK
+        legal_moves = []
+        for ray in rays:
+            for target in ray:
+                target_code = mailbox[target]
+                if target_code == EMPTY:
+                    continue
+                if target_code & BLACK != colour and not flags[target] & INVULNERABLE:
+                    legal_moves.append(POSITIONS[target])
+                break
         return legal_moves
 
-    def legal_moves_from_dependancies(self, piece):
+    def legal_moves_from_dependancies(self, index):
         """
         Some moves don't fit into unconditional moves (like Dog or Frog hops), but also aren't directional.
         (Such as the Blob0 moving like a knight being dependent on the pawn to its diagonal.
 
-        This method looks through the available squares for those pieces and their dependancies
+        This method looks through the available squares for the piece at the mailbox index and their dependancies
         And returns a list of available moves
         """
-        legal_moves = [move for move, dependancy in piece.dependant_moves() if
-                       self.square_in_position(dependancy) is None and self.square_in_position(move) is None]
-        if type(piece) == Chicken:
-            row, col = piece.position
-            adjacent_pieces = [self.square_in_position((row - 1, col - 1)), self.square_in_position((row - 1, col)),
-                               self.square_in_position((row - 1, col + 1)),
-                               self.square_in_position((row, col - 1)), self.square_in_position((row, col + 1)),
-                               self.square_in_position((row + 1, col - 1)), self.square_in_position((row + 1, col)),
-                               self.square_in_position((row + 1, col + 1))]
-            if Blob0 in [type(adjacentPiece) for adjacentPiece in adjacent_pieces]:
-                legal_moves.extend([move for move, dependancy in piece.blob0_dependant_moves() if
-                                    self.square_in_position(dependancy) is None and self.square_in_position(
-                                        move) is None])
+        mailbox = self.mailbox
+        code = mailbox[index]
+        legal_moves = [POSITIONS[move] for move, dependancy in DEPENDANT_MOVES[code][index] if
+                       mailbox[dependancy] == EMPTY and mailbox[move] == EMPTY]
+        if code & KIND_MASK == CHICKEN:
+            if any(mailbox[index + step] & KIND_MASK == BLOB0 for step in ADJACENT_STEPS):
+                legal_moves.extend([POSITIONS[move] for move, dependancy in CHICKEN_BLOB0_DEPENDANT_MOVES[index] if
+                                    mailbox[dependancy] == EMPTY and mailbox[move] == EMPTY])
         return legal_moves
 
-    def legal_takes_from_dependancies(self, piece):
+    def legal_takes_from_dependancies(self, index, adjacent_pieces=None):
         """
         Looks through legal takes from dependancies and returns them as a list of available moves.
         """
-        dependant_takes = []
-        legal_moves = [move for move, dependancy in piece.dependant_takes() if
-                       self.square_in_position(dependancy) is None and issubclass(type(self.square_in_position(move)),
-                                                                                  Piece) and self.square_in_position(
-                           move).is_white != piece.is_white]
-        if type(piece) == Chicken:
-            adjacent_pieces = self.adjacent_piece_types(piece.position)
+        mailbox = self.mailbox
+        code = mailbox[index]
+        colour = code & BLACK
+        legal_moves = [POSITIONS[move] for move, dependancy in DEPENDANT_TAKES[code][index] if
+                       mailbox[dependancy] == EMPTY and mailbox[move] != EMPTY and mailbox[move] & BLACK != colour]
+        if code & KIND_MASK == CHICKEN:
+            if adjacent_pieces is None:
+                adjacent_pieces = self.adjacent_piece_types(POSITIONS[index])
             if Blob0 in adjacent_pieces:
-                legal_moves.extend([move for move, dependancy in piece.blob0_dependant_moves() if
-                                    self.square_in_position(dependancy) is None and
-                                    issubclass(type(self.square_in_position(move)), Piece) and
-                                    self.square_in_position(move).is_white != piece.is_white])
+                legal_moves.extend([POSITIONS[move] for move, dependancy in CHICKEN_BLOB0_DEPENDANT_MOVES[index] if
+                                    mailbox[dependancy] == EMPTY and
+                                    mailbox[move] != EMPTY and mailbox[move] & BLACK != colour])
         return legal_moves
 
     def castle_moves(self, piece):
@@ -567,14 +669,15 @@ class ChessBoard:
             return []
         castle_moves = []
         back_rank_row = 9 if piece.is_white else 1
-        back_rank = self.squares[back_rank_row]
-        if type(back_rank[0]) is Rook and not back_rank[0].has_moved and \
-                {back_rank[1], back_rank[2], back_rank[3], back_rank[4]} == {None} and not \
+        back_rank = self.mailbox[to_index((back_rank_row, 0)):to_index((back_rank_row, 10))]
+        back_rank_flags = self.flags[to_index((back_rank_row, 0)):to_index((back_rank_row, 10))]
+        if back_rank[0] & KIND_MASK == ROOK and not back_rank_flags[0] & HAS_MOVED and \
+                {back_rank[1], back_rank[2], back_rank[3], back_rank[4]} == {EMPTY} and not \
                 (self.would_be_check(piece.is_white, ((piece.position), (back_rank_row, 3))) or
                  self.would_be_check(piece.is_white, ((piece.position), (back_rank_row, 4)))):
             castle_moves.append((back_rank_row, 3))
-        if type(back_rank[9]) is Rook and not back_rank[9].has_moved and \
-                {back_rank[6], back_rank[7], back_rank[8]} == {None} and not \
+        if back_rank[9] & KIND_MASK == ROOK and not back_rank_flags[9] & HAS_MOVED and \
+                {back_rank[6], back_rank[7], back_rank[8]} == {EMPTY} and not \
                 (self.would_be_check(piece.is_white, ((piece.position), (back_rank_row, 7))) or
                  self.would_be_check(piece.is_white, ((piece.position), (back_rank_row, 6)))):
             castle_moves.append((back_rank_row, 7))
@@ -583,14 +686,13 @@ class ChessBoard:
     def tick_all_pieces(self):
         """
         Some pieces have properties that they lose after a certain time (Panda invulnerability, Pawn enPassantable)
-        This method simply iterates through every pieces in self.squares and runs the tick() method on them.
+        This method runs the tick() method on every piece that has one of these properties, which set_index keeps track
+        of in ticking_indices. For every other piece, tick() would not do anything.
         """
-        for row in self.squares:
-            for square in row:
-                if issubclass(type(square), Piece):
-                    output = square.tick()
-                    if output is not None:
-                        self.set_square_in_position(square.position, output)
+        for index in sorted(self.ticking_indices):
+            square = self.square_in_position(POSITIONS[index])
+            output = square.tick()
+            self.set_square_in_position(POSITIONS[index], square if output is None else output)
 
     def selectPiece(self, position):
         """
@@ -623,8 +725,28 @@ class ChessBoard:
         Also, performs many complex checks for additional actions that must be performed when a piece moves.
         (Dog doubleHopping, Blob duplication)
         """
-        self.previous_board_states.append(self.board_state())
+        # Everything needed to undo the move: the old contents of each square that changes, the forced move and
+        # whose turn it is. A double move adds its changes to the same entry.
+        self.journal = []
+        self.undo_stack.append((self.journal, None if self.forced_move is None else self.forced_move.position,
+                                self.white_to_move))
         self.checked_positions = None
+        self.move_piece_squares(start_position, end_position)
+
+        if self.forced_move is not None:
+            self.second_moves = self.all_legal_moves(self.forced_move.position)
+            if not len(self.second_moves) > 0:
+                self.white_to_move = not self.white_to_move
+        else:
+            self.white_to_move = not self.white_to_move
+
+        self.moves.append([start_position, end_position])
+
+    def move_piece_squares(self, start_position, end_position):
+        """
+        Makes every change to the squares for a move, and sets forced_move if the piece gets a second move.
+        Does not decide whose turn it is next, which needs the legal moves of the forced_move piece.
+        """
         take = False
         piece_to_be_moved = self.square_in_position(start_position)
 
@@ -670,7 +792,7 @@ class ChessBoard:
                     or type(piece_to_be_moved) == Death:
                 self.forced_move = piece_to_be_moved
             if type(piece_to_be_moved) == Chicken and Panda in adjacent_pieces:
-                piece_to_be_moved.pandaTake()
+                piece_to_be_moved.panda_take()
             if type(piece_to_be_moved) == Chicken and (
                     Blob0 in adjacent_pieces or Blob1 in adjacent_pieces or Blob2 in adjacent_pieces):
                 self.set_square_in_position(start_position,
@@ -712,29 +834,32 @@ class ChessBoard:
             if type(piece_to_be_moved) == King and abs(start_position[1] - end_position[1]) == 2:
                 if end_position == (9, 3):
                     rook_to_move = self.square_in_position((9, 0))
-                    self.set_square_in_position((9, 4), rook_to_move)
-                    self.set_square_in_position((9, 0), None)
                     rook_to_move.position = (9, 4)
                     rook_to_move.has_moved = True
+                    self.set_square_in_position((9, 4), rook_to_move)
+                    self.set_square_in_position((9, 0), None)
                 elif end_position == (9, 7):
                     rook_to_move = self.square_in_position((9, 9))
-                    self.set_square_in_position((9, 6), rook_to_move)
-                    self.set_square_in_position((9, 9), None)
                     rook_to_move.position = (9, 6)
                     rook_to_move.has_moved = True
+                    self.set_square_in_position((9, 6), rook_to_move)
+                    self.set_square_in_position((9, 9), None)
                 elif end_position == (0, 3):
                     rook_to_move = self.square_in_position((0, 0))
-                    self.set_square_in_position((0, 4), rook_to_move)
-                    self.set_square_in_position((0, 0), None)
                     rook_to_move.position = (9, 4)
                     rook_to_move.has_moved = True
+                    self.set_square_in_position((0, 4), rook_to_move)
+                    self.set_square_in_position((0, 0), None)
                 elif end_position == (0, 7):
                     rook_to_move = self.square_in_position((0, 9))
-                    self.set_square_in_position((0, 6), rook_to_move)
-                    self.set_square_in_position((0, 9), None)
                     rook_to_move.position = (0, 6)
                     rook_to_move.has_moved = True
+                    self.set_square_in_position((0, 6), rook_to_move)
+                    self.set_square_in_position((0, 9), None)
             piece_to_be_moved.move(start_position, end_position)
+        if self.piece_cache[to_index(end_position)] is piece_to_be_moved:
+            # take() and move() change the state of the piece, which only reaches the flags table once it is placed again
+            self.set_square_in_position(end_position, piece_to_be_moved)
         if type(piece_to_be_moved) == Pawn and end_position[0] in (0, 9):
             column = piece_to_be_moved.position[1]
             availablePromotionPieces = [Rook(is_white=piece_to_be_moved.is_white, position=end_position),
@@ -749,14 +874,6 @@ class ChessBoard:
                                         Rook(is_white=piece_to_be_moved.is_white, position=end_position)]
             self.set_square_in_position(end_position, availablePromotionPieces[column])
 
-        if self.forced_move is not None:
-            if not len(self.all_legal_moves(self.forced_move.position)) > 0:
-                self.white_to_move = not self.white_to_move
-        else:
-            self.white_to_move = not self.white_to_move
-
-        self.moves.append([start_position, end_position])
-
     def double_move_piece(self, start_position, end_position):
         """
         A simpler version of the move_piece method that is run in its place for the second move in doubleHop moves.
@@ -776,46 +893,177 @@ class ChessBoard:
             self.moves.append([start_position, end_position])
         self.check_check(not piece.is_white)
 
+    def is_index_attacked(self, target, by_white):
+        """
+        Checks if any piece of the given colour could take the piece on a mailbox index.
+        This gives the same answer as looking for the index in legal_takes(position, False) for every piece of that
+        colour (ignoring forced_move), but works outwards from the index instead: it looks up the squares a hopping
+        piece would have to be on, follows each ray out to its first piece, and only works out the adjacent pieces of
+        a Chicken that is in a square to take from.
+        """
+        mailbox, flags = self.mailbox, self.flags
+        colour = 0 if by_white else BLACK
+        target_code = mailbox[target]
+        is_enemy = target_code != EMPTY and target_code & BLACK != colour
+        chicken_adjacent_pieces = {}
+
+        def adjacent_pieces(index):
+            if index not in chicken_adjacent_pieces:
+                chicken_adjacent_pieces[index] = self.adjacent_piece_types(POSITIONS[index])
+            return chicken_adjacent_pieces[index]
+
+        if is_enemy and not flags[target] & INVULNERABLE:
+            for step, codes in HOP_ATTACKERS:
+                index = target - step
+                code = mailbox[index]
+                if code == EMPTY or code == OFF_BOARD or code & BLACK != colour:
+                    continue
+                if code in codes:
+                    return True
+                if code & KIND_MASK == CHICKEN:
+                    if step in CHICKEN_KING_REACH:
+                        return True
+                    if step in CHICKEN_KNIGHT_STEPS and (Dog in adjacent_pieces(index) or
+                                                         Knight in adjacent_pieces(index)):
+                        return True
+                    if step in CHICKEN_FROG_STEPS and Frog in adjacent_pieces(index):
+                        return True
+
+            for step in ADJACENT_STEPS:
+                index = target
+                distance = 0
+                while True:
+                    index -= step
+                    distance += 1
+                    code = mailbox[index]
+                    if code != EMPTY:
+                        break
+                if code == OFF_BOARD or code & BLACK != colour:
+                    continue
+                if code & KIND_MASK == CHICKEN:
+                    if self.chicken_take_reach(adjacent_pieces(index)).get(step, 0) >= distance:
+                        return True
+                elif TAKE_REACH[code].get(step, 0) >= distance:
+                    return True
+
+        if is_enemy:
+            for step, dependancy, codes in DEPENDANT_ATTACKERS:
+                index = target - step
+                code = mailbox[index]
+                if code in codes and code & BLACK == colour and mailbox[index + dependancy] == EMPTY:
+                    return True
+            for step, dependancy in CHICKEN_BLOB0_DEPENDANT_STEPS:
+                index = target - step
+                code = mailbox[index]
+                if code == piece_code(CHICKEN, by_white) and mailbox[index + dependancy] == EMPTY and \
+                        Blob0 in adjacent_pieces(index):
+                    return True
+
+        return self.is_en_passant_target(target, by_white)
+
+    def is_en_passant_target(self, target, by_white):
+        """
+        Checks if a Pawn (or a Chicken next to one) of the given colour has an en passant take onto a mailbox index.
+        En passant takes are allowed onto any square, even one holding a piece of the same colour.
+        """
+        mailbox = self.mailbox
+        row, col = POSITIONS[target]
+        for target_row, row_from, pawn_rows in EN_PASSANT_ATTACKS[by_white]:
+            if row == target_row and any(self.is_en_passantable_pawn((pawn_row, col)) for pawn_row in pawn_rows):
+                for index in (to_index((row_from, col - 1)), to_index((row_from, col + 1))):
+                    code = mailbox[index]
+                    if code == piece_code(PAWN, by_white) or (code == piece_code(CHICKEN, by_white) and
+                                                              Pawn in self.adjacent_piece_types(POSITIONS[index])):
+                        return True
+        return False
+
+    @staticmethod
+    def chicken_take_reach(adjacent_pieces):
+        """
+        How far a Chicken with the given adjacent pieces can take with each step, following
+        legal_takes_from_directions. Every Chicken can also take on the squares next to it.
+        """
+        reaches = [CHICKEN_KING_REACH]
+        if Rook in adjacent_pieces or Queen in adjacent_pieces:
+            reaches.append(CHICKEN_ROOK_REACH)
+        if Bishop in adjacent_pieces or Cleric in adjacent_pieces or Queen in adjacent_pieces:
+            reaches.append(CHICKEN_BISHOP_REACH)
+        if Blob0 in adjacent_pieces:
+            reaches.append(CHICKEN_BLOB_REACH[0])
+        if Blob1 in adjacent_pieces:
+            reaches.append(CHICKEN_BLOB_REACH[1])
+        if Blob2 in adjacent_pieces or King in adjacent_pieces or Panda in adjacent_pieces:
+            reaches.append(CHICKEN_BLOB_REACH[2])
+        if Blob3 in adjacent_pieces:
+            reaches.append(CHICKEN_BLOB_REACH[3])
+        return {step: max(reach.get(step, 0) for reach in reaches) for step in ADJACENT_STEPS}
+
     def check_check(self, white_in_check, checkDoubleHops=True):
         """
         Checks if a given player is in check in the current position.
+        A player is also in check if a piece that moves twice could take something and then take their King.
         """
-        king_positions = self.find_pieces(white_in_check, King)
+        king_positions = [POSITIONS[index] for index in self.king_indices(white_in_check)]
         self.checked_positions = []
         if len(king_positions) == 0:
             return True
         for kingPos in king_positions:
-            for row in self.squares:
-                for square in row:
-                    if square is not None:
-                        if kingPos in self.legal_takes(square.position, False):
-                            self.checked_positions.append(kingPos)
-                            return True
+            if self.forced_move is not None:
+                # Only the forced piece can take anything
+                is_check = kingPos in self.legal_takes(self.forced_move.position, False)
+            else:
+                is_check = self.is_index_attacked(to_index(kingPos), not white_in_check) or \
+                    self.is_en_passant_target(to_index(kingPos), white_in_check)
+            if is_check:
+                self.checked_positions.append(kingPos)
+                return True
 
         # Adds the ability to not check for double hops so that it is possible to check only one hop into the future
         if not checkDoubleHops:
             return False
 
-        # Do a simple check for available captures first, and then check the more complicated double-moves.
-        for row in self.squares:
-            for square in row:
-                if type(square) == Chicken:
-                    adjacent_pieces = self.adjacent_piece_types(square.position)
-                if type(square) == Dog or type(square) == Death or (type(square) == Chicken and Dog in adjacent_pieces):
-                    for move in self.legal_takes(square.position, False):
-                        if type(square) == Dog:
-                            newPiece = Dog(is_white=square.is_white, position=move)
-                        else:
-                            newPiece = Chicken(is_white=square.is_white, position=move)
-                        board = ChessBoard(board_state=self.board_state(), white_to_move=square.is_white)
-                        board.set_square_in_position(square.position, None)
-                        board.set_square_in_position(move, newPiece)
-                        isCheck = board.check_check(white_in_check, checkDoubleHops=False)
-                        del newPiece
-                        del board
-                        if isCheck:
-                            self.checked_positions.append(kingPos)
-                            return True
+        king_indices = [to_index(position) for position in king_positions]
+        if self.double_hop_gives_check(white_in_check, king_indices, self.double_hop_indices()):
+            self.checked_positions.append(kingPos)
+            return True
+        return False
+
+    def double_hop_indices(self):
+        """
+        The mailbox indices of every piece, of either colour, that would move again after a take:
+        Dogs, Deaths and Chickens next to a Dog.
+        """
+        piece_indices = self.piece_indices
+        indices = []
+        for is_white in (True, False):
+            indices.extend(piece_indices[piece_code(DOG, is_white)])
+            indices.extend(piece_indices[piece_code(DEATH, is_white)])
+            indices.extend(index for index in piece_indices[piece_code(CHICKEN, is_white)]
+                           if Dog in self.adjacent_piece_types(POSITIONS[index]))
+        return sorted(indices)
+
+    def double_hop_gives_check(self, white_in_check, king_indices, double_hop_indices):
+        """
+        Checks if any piece on double_hop_indices could take something and then take a King on king_indices.
+        For each first take, the piece is swapped in the mailbox for a new Dog (or a new Chicken for anything else), and
+        then put back after looking for a single hop check.
+        """
+        mailbox, flags = self.mailbox, self.flags
+        for index in double_hop_indices:
+            new_code = piece_code(DOG if mailbox[index] & KIND_MASK == DOG else CHICKEN, is_white_code(mailbox[index]))
+            for move in self.legal_takes(POSITIONS[index], False):
+                end = to_index(move)
+                old_code, old_flags, old_target, old_target_flags = mailbox[index], flags[index], mailbox[end], flags[end]
+                self.poke(index, EMPTY, 0)
+                self.poke(end, new_code, 0)
+                remaining_kings = [king for king in king_indices if king != end]
+                isCheck = len(remaining_kings) == 0 or \
+                    any(self.is_index_attacked(king, not white_in_check) or
+                        self.is_en_passant_target(king, white_in_check) for king in remaining_kings)
+                self.poke(index, old_code, old_flags)
+                self.poke(end, old_target, old_target_flags)
+                if isCheck:
+                    return True
         return False
 
     def check_checkmate(self, white_in_check):
@@ -825,15 +1073,15 @@ class ChessBoard:
         check for how many moves the player has available to them. If they don't have any moves: return True
         """
         if self.check_check(white_in_check):
-            if len(self.legal_moves_for_every_piece()) == 0:
+            if not self.has_any_legal_move():
                 return True
         return False
 
     def scheck_stalemate(self):
         """
-        Checks for stalemate by counting the number of legal pieces. If the amount is 0, returns True
+        Checks for stalemate by looking for a legal move. If there are none, returns True
         """
-        if len(self.legal_moves_for_every_piece()) == 0 and self.forced_move is None:
+        if self.forced_move is None and not self.has_any_legal_move():
             return True
         elif len(self.moves) >= 1000:
             self.victor = False
@@ -847,15 +1095,171 @@ class ChessBoard:
 
     def would_be_check(self, white_in_check, move):
         """
-        Creates a new chessBoard object with the same board_state, makes the given move, and checks for check in the
-        new ChessBoard object. Deleted the new object before returning.
+        Checks if a player would be in check after the given move, as if the move was made on a new ChessBoard with the
+        same board_state.
+
+        Simple moves by the player's own pieces are checked against legality_info, which says which pieces are pinned
+        and whether the King is already attacked, so most of them are decided without changing the board at all.
+        Everything else (King and Chicken moves, Blob splits, en passant, promotions, takes by pieces that move twice,
+        and moves by the other player) is tried out on this board and then undone.
         """
-        board = ChessBoard(self.board_state(), white_in_check)
-        board.move_piece(move[0], move[1])
-        would_be_check = board.check_check(white_in_check)
-        del board
+        start, end = to_index(move[0]), to_index(move[1])
+        mailbox, flags = self.mailbox, self.flags
+        code, target = mailbox[start], mailbox[end]
+        info = self.legality_info(white_in_check)
+        if info is None and piece_code(KING, white_in_check) not in mailbox:
+            # No move can make a King, and a player without one is always in check
+            return True
+        if info is None or is_white_code(code) is not white_in_check or not self.is_simple_move(start, end):
+            saved = self.begin_trial()
+            self.move_piece_squares(move[0], move[1])
+            would_be_check = ChessBoard.check_check(self, white_in_check)
+            self.end_trial(saved)
+            return would_be_check
+
+        king, attacked, pinned, double_hops, ticking = info
+        # A Dog or Death that moves takes its place in double_hops with it
+        double_hops = [end if index == start else index for index in double_hops if index != end]
+        if not attacked and start not in pinned and not double_hops:
+            return False
+        # The move is made straight on the mailbox, with the flags that tick_all_pieces would clear already cleared
+        changes = [(index, flags[index]) for index in ticking]
+        start_flags, end_flags = flags[start], flags[end]
+        for index in ticking:
+            flags[index] &= ~TIMERS
+        self.poke(start, EMPTY, 0)
+        self.poke(end, code, INVULNERABLE if code & KIND_MASK == PANDA and target != EMPTY else 0)
+        forced_move, self.forced_move = self.forced_move, None
+        would_be_check = ((attacked or start in pinned) and self.is_index_attacked(king, not white_in_check)) or \
+            self.double_hop_gives_check(white_in_check, [king], double_hops)
+        self.forced_move = forced_move
+        self.poke(start, code, start_flags)
+        self.poke(end, target, end_flags)
+        for index, old_flags in reversed(changes):
+            flags[index] = old_flags
         return would_be_check
 
+    def is_simple_move(self, start, end):
+        """
+        A simple move only changes the start and end squares (and the flags that tick away), and does not change what
+        any Chicken inherits.
+        """
+        mailbox = self.mailbox
+        code, target = mailbox[start], mailbox[end]
+        kind = code & KIND_MASK
+        if kind in (KING, CHICKEN) or (kind in (BLOB0, BLOB1, BLOB2, DOG, DEATH) and target != EMPTY):
+            return False
+        if kind == PAWN:
+            row, col = POSITIONS[end]
+            forwards = -WIDTH if is_white_code(code) else WIDTH
+            if row in (0, 9) or not (end == start + forwards and target == EMPTY or
+                                     end in (start + forwards - 1, start + forwards + 1) and target != EMPTY):
+                return False
+        return not any(mailbox[start + step] & KIND_MASK == CHICKEN or mailbox[end + step] & KIND_MASK == CHICKEN
+                       for step in ADJACENT_STEPS)
+
+    def legality_info(self, white_in_check):
+        """
+        Works out what would_be_check needs to decide simple moves for a player, as (King index, whether the King is
+        attacked, pinned indices, indices of pieces that move twice, indices with flags that tick away).
+        A pinned index holds a piece that is the only thing stopping a ray or a dependant take from reaching the King.
+        Everything is worked out as it will be once tick_all_pieces has run, so en passant takes are left out.
+
+        Returns None if there is not exactly one King, or if an Egg is about to hatch.
+        The result is kept until the squares change, so it is only worked out once per position.
+        """
+        key = (self.board_hash, white_in_check)
+        if self.legality_key == key:
+            return self.legality
+        self.legality_key = key
+        self.legality = None
+        mailbox, flags = self.mailbox, self.flags
+        kings = self.king_indices(white_in_check)
+        ticking = sorted(self.ticking_indices)
+        if len(kings) != 1 or any(flags[index] & HATCH_MASK == 1 << HATCH_SHIFT for index in ticking):
+            return None
+        king = kings[0]
+        colour = BLACK if white_in_check else 0
+        old_flags = [flags[index] for index in ticking]
+        for index in ticking:
+            flags[index] &= ~TIMERS
+
+        attacked = self.is_index_attacked(king, not white_in_check)
+        pinned = set()
+        for step in ADJACENT_STEPS:
+            # The first piece along the ray from the King, then the piece behind it and how far away it is
+            index = king
+            distance = 0
+            pieces = []
+            while len(pieces) < 2:
+                index -= step
+                distance += 1
+                if mailbox[index] == OFF_BOARD:
+                    break
+                if mailbox[index] != EMPTY:
+                    pieces.append(index)
+            if len(pieces) < 2 or mailbox[pieces[0]] & BLACK == colour or mailbox[pieces[1]] & BLACK != colour:
+                continue
+            attacker = pieces[1]
+            if mailbox[attacker] & KIND_MASK == CHICKEN:
+                reach = self.chicken_take_reach(self.adjacent_piece_types(POSITIONS[attacker]))
+            else:
+                reach = TAKE_REACH[mailbox[attacker]]
+            if reach.get(step, 0) >= distance:
+                pinned.add(pieces[0])
+        for step, dependancy, codes in DEPENDANT_ATTACKERS:
+            attacker = king - step
+            if mailbox[attacker] in codes and mailbox[attacker] & BLACK == colour:
+                pinned.add(attacker + dependancy)
+        for step, dependancy in CHICKEN_BLOB0_DEPENDANT_STEPS:
+            attacker = king - step
+            if mailbox[attacker] == piece_code(CHICKEN, not white_in_check) and \
+                    Blob0 in self.adjacent_piece_types(POSITIONS[attacker]):
+                pinned.add(attacker + dependancy)
+
+        for index, old in zip(ticking, old_flags):
+            flags[index] = old
+        self.legality = (king, attacked, pinned, self.double_hop_indices(), ticking)
+        return self.legality
+
+    def begin_trial(self):
+        """
+        Starts trying out a move on this board instead of on a copy. end_trial puts everything back.
+        Until then the board acts like a new ChessBoard made from board_state(): there is no forced move, and flags that
+        a board_state cannot show (like a Death being invulnerable) are cleared.
+        """
+        saved = (self.journal, self.piece_cache, self.forced_move, self.white_to_move, self.checked_positions,
+                 self.selected_piece, len(self.moves))
+        self.journal = []
+        # Piece objects are changed in place while a move is made, so the trial gets its own
+        self.piece_cache = [None] * SIZE
+        self.normalise()
+        return saved
+
+    def end_trial(self, saved):
+        self.rewind_journal(0)
+        self.journal, self.piece_cache, self.forced_move, self.white_to_move, self.checked_positions, \
+            self.selected_piece, moves = saved
+        del self.moves[moves:]
+
+    def rewind_journal(self, length):
+        """
+        Puts back every square changed since the journal had the given length.
+        """
+        journal = self.journal
+        self.journal = None
+        while len(journal) > length:
+            self.set_index(*journal.pop())
+        self.journal = journal
+
+    def shift_piece(self, start, end):
+        """
+        Moves whatever is on one mailbox index to another, without any of the rules in move_piece.
+        """
+        code, flags = self.mailbox[start], self.flags[start]
+        self.set_index(start, EMPTY, 0)
+        self.set_index(end, code, flags)
+
     def simulate_game(self, moves):
         """
         Given a list of moves, simulates the game
@@ -900,37 +1304,77 @@ class ChessBoard:
 
     def current_value(self):
         """
-        Adds up the values of all the current pieces.
+        Adds up the values of all the current pieces, from the running totals that code_changed keeps for each colour.
         """
-        total = 0
-        for row in self.squares:
-            for square in row:
-                if issubclass(type(square), Piece):
-                    total += square.game_value()
-        return total
+        return self.material[True] + self.material[False]
 
     def adjacent_spaces(self, position, discovered=None):
-        if discovered is None:
-            discovered = []
-        disc = discovered[:]
-        disc.append(position)
-        row, col = position
-        adjacent_spaces = [(row, col) for (row, col) in [(row + 1, col + 1), (row + 1, col),
-                                                         (row + 1, col - 1), (row, col + 1),
-                                                         (row, col - 1), (row - 1, col + 1),
-                                                         (row - 1, col), (row - 1, col - 1)] if
-                           0 <= row <= 9 and 0 <= col <= 9]
-        for space in adjacent_spaces:
-            if space in disc:
-                continue
-            elif type(self.square_in_position(space)) == Chicken:
-                disc.extend(self.adjacent_spaces(space, disc))
+        """
+        Returns the given position, every Chicken connected to it through a chain of adjacent Chickens,
+        and every square next to any of them.
+        """
+        return [POSITIONS[index] for index in self.adjacent_indices(position, discovered)]
+
+    def adjacent_indices(self, position, discovered=None):
+        """
+        The same as adjacent_spaces, but as a set of mailbox indices.
+
+        Unless discovered is given, the result is kept in adjacency_cache until a square in it changes piece. A change
+        anywhere else cannot join a Chicken onto the cluster or change what is next to it. Every Chicken in a cluster
+        has the same result, so it is worked out once for the whole cluster.
+        """
+        mailbox = self.mailbox
+        start = to_index(position)
+        if discovered is None and start in self.adjacency_cache:
+            return self.adjacency_cache[start][0]
+        seen = {start}
+        if discovered is not None:
+            seen.update(to_index(space) for space in discovered)
+        chickens = [start]
+        cluster = [start]
+        while chickens:
+            index = chickens.pop()
+            for step in ADJACENT_STEPS:
+                neighbour = index + step
+                if neighbour in seen or mailbox[neighbour] == OFF_BOARD:
+                    continue
+                seen.add(neighbour)
+                if mailbox[neighbour] & KIND_MASK == CHICKEN:
+                    chickens.append(neighbour)
+                    cluster.append(neighbour)
+        if discovered is not None:
+            return seen
+        seen = frozenset(seen)
+        entry = (seen, frozenset(PIECE_CLASSES[mailbox[index] & KIND_MASK] for index in seen))
+        if mailbox[start] & KIND_MASK != CHICKEN:
+            cluster = [start]
+        for chicken in cluster:
+            self.adjacency_cache[chicken] = entry
+        watchers = self.adjacency_watchers
+        for index in seen:
+            if index in watchers:
+                watchers[index].update(cluster)
             else:
-                disc.append(space)
-        return disc
+                watchers[index] = set(cluster)
+        return seen
 
     def adjacent_piece_types(self, position):
-        return {type(self.square_in_position(space)) for space in self.adjacent_spaces(position)}
+        """
+        The types of the pieces in adjacent_spaces, with NoneType for an empty square.
+        """
+        start = to_index(position)
+        if start not in self.adjacency_cache:
+            self.adjacent_indices(position)
+        return self.adjacency_cache[start][1]
+
+    def forget_adjacency(self, index):
+        """
+        Drops every adjacency_cache result that the square on a mailbox index is part of, after it changes piece.
+        """
+        starts = self.adjacency_watchers.pop(index, None)
+        if starts:
+            for start in starts:
+                self.adjacency_cache.pop(start, None)
 
     def double_hop_start_positions(self):
         """
@@ -953,27 +1397,63 @@ class ChessBoard:
         """
         board_states = []
         doubleHops = self.double_hop_start_positions()
-        new_board = ChessBoard(board_state=self.board_state(), white_to_move=self.white_to_move)
-        for move in [move for move in self.legal_moves_for_every_piece(prefer_pieces=prefer_pieces) if
-                     move[0] not in doubleHops]:
-            new_board.move_piece(move[0], move[1])
-            board_states.append((new_board.board_state(), move))
-            new_board.undo_move()
+        new_board = self.copy(history=False)
+        new_board.normalise()
+        positions = [POSITIONS[index] for index in self.indices_with_pieces(care_about_colour=True)
+                     if POSITIONS[index] not in doubleHops]
+        if prefer_pieces is not None:
+            positions = [position for position in positions if self.square_in_position(position) in prefer_pieces]
+        for position in positions:
+            for move in self.all_legal_moves(position):
+                new_board.move_piece(position, move)
+                board_states.append((new_board.board_state(), (position, move)))
+                new_board.undo_move()
         for start_pos in doubleHops:
-            for move in self.all_legal_moves(start_pos):
-                new_board.move_piece(start_pos, move)
-                if new_board.white_to_move == self.white_to_move:
-                    for doubleMove in new_board.all_legal_moves(move):
-                        new_board.move_piece(move, doubleMove)
-                        board_states.append((new_board.board_state(), (start_pos, move, doubleMove)))
-                        new_board.undo_move()
-                    new_board.undo_move()
-                else:
+            for move, doubleMoves in new_board.double_moves(start_pos, self.all_legal_moves(start_pos)):
+                if doubleMoves is None:
                     board_states.append((new_board.board_state(), (start_pos, move)))
+                    continue
+                for doubleMove in doubleMoves:
+                    new_board.move_piece(move, doubleMove)
+                    board_states.append((new_board.board_state(), (start_pos, move, doubleMove)))
                     new_board.undo_move()
         del new_board
         return board_states
 
+    def double_moves(self, start_position, first_moves=None):
+        """
+        Makes each first move of the piece on start_position in turn, and yields (first_move, second_moves) while the
+        board is in the position after it. second_moves is the list of legal second moves, or None if the first move
+        did not earn one. Each move is undone before the next one is made.
+
+        This is the one place that works out double moves, so available_board_states and the Engine share it. The
+        second moves are the ones move_piece already found when deciding whose turn it is, rather than being worked
+        out again.
+        """
+        if first_moves is None:
+            first_moves = self.all_legal_moves(start_position)
+        white_to_move = self.white_to_move
+        for first_move in first_moves:
+            self.move_piece(start_position, first_move)
+            if self.forced_move is not None and self.white_to_move == white_to_move:
+                yield first_move, self.second_moves
+            else:
+                yield first_move, None
+            self.undo_move()
+
+    def compound_moves(self, start_position, first_moves=None):
+        """
+        Returns the moves of a piece that can move twice, as (start_position, end_position), or as
+        (start_position, middle_position, end_position) for a first move that earns a second one.
+        """
+        moves = []
+        for first_move, second_moves in self.double_moves(start_position, first_moves):
+            if second_moves is None:
+                moves.append((start_position, first_move))
+            else:
+                moves.extend((start_position, first_move, second_move) for second_move in second_moves)
+        return moves
+
     def make_random_move(self):
         """
         Literally just selects a random move and makes it
@@ -989,38 +1469,43 @@ class ChessBoard:
 
     def undo_move(self):
         """
-        Sends the board back to its previous position.
+        Sends the board back to its previous position, by putting back every square changed since the last move_piece.
         """
+        changes, forced_position, white_to_move = self.undo_stack.pop()
         self.moves.pop(len(self.moves) - 1)
-        self.set_board_state(self.previous_board_states[len(self.previous_board_states) - 1])
-        self.previous_board_states = self.previous_board_states[:len(self.previous_board_states) - 1]
-        self.white_to_move = not self.white_to_move
+        self.journal = None
+        for index, code, flags in reversed(changes):
+            self.set_index(index, code, flags)
+        self.forced_move = None if forced_position is None else self.square_in_position(forced_position)
+        # Back in the middle of a double move, its second move still adds to the entry of the first
+        if self.forced_move is not None and self.undo_stack:
+            self.journal = self.undo_stack[-1][0]
+        self.white_to_move = white_to_move
         self.checked_positions = None
         self.victor = None
 
+    @property
+    def position_hash(self):
+        """
+        A 64-bit Zobrist hash of the position, including whose turn it is and the forced_move piece.
+        self.board_hash only covers the squares, and is kept up to date by set_index.
+        """
+        return self.board_hash ^ extra_keys(self.white_to_move,
+                                            None if self.forced_move is None else self.forced_move.position)
+
     @property
     def features(self):
-        features_arr = np.zeros(101)
-        i = 0
-        for row in self.squares:
-            for square in row:
-                if issubclass(type(square), Piece):
-                    features_arr[i] = square.feature_int
-                i+=1
+        """
+        The FEATURE_INTS of every square, followed by whether it is White's turn, as a new array.
+        Only the code on a square changes its feature int, so code_changed keeps self.feature_vector up to date.
+        """
+        features_arr = self.feature_vector.copy()
         features_arr[-1] = int(self.white_to_move)
         return features_arr
 
     @property
     def material_values(self):
-        black, white = 0, 0
-        for row in self.squares:
-            for square in row:
-                if issubclass(type(square), Piece):
-                    if square.is_white:
-                        white += square.value
-                    else:
-                        black += square.value
-        return black - white
+        return -self.current_value()
 
 
 
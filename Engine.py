@@ -0,0 +1,306 @@
+"""
+A negamax search engine with alpha-beta pruning and iterative deepening.
+
+The engine searches a single ChessBoard, making and undoing moves on it instead of building a tree of board states.
+Moves that give a piece a second move (Dog, Death and Dog-adjacent Chicken captures) are searched as one compound move
+(start_position, middle_position, end_position), the same way available_board_states returns them.
+
+Scores are material from White's point of view, like agent.score_board_state. Checkmate is worth MATE_SCORE (9999),
+minus the number of plies it takes, so that the engine prefers the quickest mate and the slowest loss.
+
+At depth 0 the engine does not score the position straight away. A quiescence search keeps playing captures (and the
+second moves they earn) until the position is quiet, so that a Dog halfway through a double capture or a Blob that
+is about to split is not scored as if the exchange were over. A player in check has every move searched instead, so
+a leaf that is checkmate scores as mate rather than as its material.
+
+A search can be bounded by SearchLimits (a time budget, a node budget and a cancellation token). When a limit is
+reached the search stops straight away and returns the result of the last iteration it completed.
+"""
+import time
+
+from ChessBoard import ChessBoard
+from PieceCodes import *
+from TranspositionTable import *
+from MoveOrdering import MoveOrderer
+from SearchLimits import SearchCancelled
+
+MATE_SCORE = 9999
+MAX_PLY = 100
+# Captures that cannot bring the score back up to within this margin of alpha are not searched in quiescence
+DELTA_MARGIN = 2
+QUIESCENCE_NODE_LIMIT = 200
+
+
+def is_mate_score(score):
+    return abs(score) > MATE_SCORE - MAX_PLY
+
+
+def quiet_score(board_state, white_to_move, node_limit=QUIESCENCE_NODE_LIMIT):
+    """
+    Scores a board_state from White's point of view, after playing out the captures available in it.
+    """
+    engine = Engine(ChessBoard(board_state, white_to_move), quiescence_limit=node_limit)
+    score, _ = engine.quiescence(-MATE_SCORE - 1, MATE_SCORE + 1, 0)
+    return score if white_to_move else -score
+
+
+class Engine:
+    """
+    Searches a copy of the given board, so the board passed in is never changed.
+
+    If a TranspositionTable is passed in, the engine uses it to skip positions it has already searched and to try the
+    best move from a previous search first. Moves are sorted by a MoveOrderer, whose killer and history tables are
+    kept between iterations.
+
+    quiescence_limit caps the number of positions each quiescence search can visit, which keeps the time spent at
+    any one leaf bounded. limits is a SearchLimits that every position the engine visits is checked against.
+    """
+
+    def __init__(self, board, table=None, ordering=None, quiescence_limit=QUIESCENCE_NODE_LIMIT, limits=None):
+        self.board = board.copy(history=False)
+        self.table = table
+        self.ordering = MoveOrderer() if ordering is None else ordering
+        self.quiescence_limit = quiescence_limit
+        self.limits = limits
+        self.quiescence_nodes = 0
+        self.nodes = 0
+        self.principal_variation = []
+        self.completed_depth = 0
+        self.stop_reason = None
+        self.search_time = 0.0
+        self.search_nodes = 0
+
+    def make_move(self, move):
+        """
+        Makes a move of 2 or 3 positions. After a compound move it is always the other player's turn.
+        """
+        board = self.board
+        white_to_move = board.white_to_move
+        board.move_piece(move[0], move[1])
+        if len(move) == 3:
+            board.move_piece(move[1], move[2])
+            board.forced_move = None
+            board.white_to_move = not white_to_move
+
+    def undo_move(self, move):
+        for _ in range(len(move) - 1):
+            self.board.undo_move()
+
+    def generate_moves(self, captures_only=False):
+        """
+        Returns every legal move for the player to move, with the second move of a double move folded into
+        compound moves. If captures_only is True, only moves that start with a take are included.
+        """
+        board = self.board
+        double_hop_start_positions = board.double_hop_start_positions()
+        moves = []
+        for index in board.indices_with_pieces(care_about_colour=True):
+            position = POSITIONS[index]
+            if captures_only:
+                first_moves = board.legal_takes(position)
+            else:
+                first_moves = board.all_legal_moves(position)
+            if not first_moves:
+                continue
+            if position in double_hop_start_positions or board.forced_move is not None:
+                moves.extend(board.compound_moves(position, first_moves))
+            else:
+                moves.extend((position, first_move) for first_move in first_moves)
+        return moves
+
+    def capture_gain(self, move):
+        """
+        The value of the enemy pieces a move takes.
+        """
+        board = self.board
+        colour = board.code_in_position(move[0]) & BLACK
+        gain = 0
+        for target in move[1:]:
+            victim = board.code_in_position(target)
+            if victim not in (EMPTY, OFF_BOARD) and victim & BLACK != colour:
+                gain += abs(VALUES[victim])
+        return gain
+
+    def evaluate(self):
+        """
+        The material score from the point of view of the player to move.
+        """
+        value = self.board.current_value()
+        return value if self.board.white_to_move else -value
+
+    def negamax(self, depth, alpha, beta, ply):
+        """
+        Returns (score, principal variation) for the player to move, searching depth plies further.
+        """
+        self.nodes += 1
+        if self.limits is not None:
+            self.limits.check(self.nodes)
+        board = self.board
+        original_alpha = alpha
+        best_move = None
+        key = board.position_hash
+        if self.table is not None:
+            entry = self.table.probe(key)
+            if entry is not None:
+                entry_depth, bound, score, best_move = entry
+                if entry_depth >= depth and ply > 0:
+                    score = self.score_from_table(score, ply)
+                    if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                        return score, [best_move] if best_move is not None else []
+
+        if depth == 0:
+            self.quiescence_nodes = 0
+            return self.quiescence(alpha, beta, ply)
+        if ply == 0 and best_move is None and self.principal_variation:
+            best_move = self.principal_variation[0]
+
+        moves = self.generate_moves()
+        if not moves:
+            if board.check_check(board.white_to_move):
+                return ply - MATE_SCORE, []
+            return 0, []
+
+        moves = self.ordering.order(board, moves, ply, best_move)
+        if ply == 0 and not self.principal_variation:
+            # What search returns if it is stopped before depth 1 is done, so it does not have to generate moves again
+            self.principal_variation = moves[:1]
+        best_score = -MATE_SCORE - 1
+        principal_variation = []
+        for move in moves:
+            self.make_move(move)
+            score, line = self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            score = -score
+            self.undo_move(move)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                principal_variation = [move] + line
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                self.ordering.cutoff(board, move, ply, depth)
+                break
+
+        if self.table is not None:
+            if best_score <= original_alpha:
+                bound = UPPER
+            elif best_score >= beta:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.table.store(key, depth, bound, self.score_to_table(best_score, ply), best_move)
+        return best_score, principal_variation
+
+    def quiescence(self, alpha, beta, ply):
+        """
+        Searches only captures, and the second moves they earn, until the position is quiet.
+        The player to move can stand pat on the current score instead of making a capture, unless they are in check:
+        then every move is searched, so that a position with no way out of check scores as mate.
+        Returns (score, principal variation) for the player to move.
+        """
+        self.nodes += 1
+        if self.limits is not None:
+            self.limits.check(self.nodes)
+        self.quiescence_nodes += 1
+        board = self.board
+        in_check = board.check_check(board.white_to_move)
+        stand_pat = self.evaluate()
+        if in_check:
+            # There is no standing pat in check: every move out of it is searched, and with none it is mate
+            moves = self.generate_moves()
+            if not moves:
+                return ply - MATE_SCORE, []
+            if self.quiescence_nodes >= self.quiescence_limit:
+                return stand_pat, []
+            best_score = -MATE_SCORE - 1
+        else:
+            if stand_pat >= beta or self.quiescence_nodes >= self.quiescence_limit:
+                return stand_pat, []
+            if stand_pat > alpha:
+                alpha = stand_pat
+            best_score = stand_pat
+            moves = self.generate_moves(captures_only=True)
+        principal_variation = []
+        for move in self.ordering.order(board, moves, ply):
+            # Delta pruning: skip captures that could not raise the score to alpha even with some margin
+            if not in_check and stand_pat + self.capture_gain(move) + DELTA_MARGIN <= alpha:
+                continue
+            self.make_move(move)
+            score, line = self.quiescence(-beta, -alpha, ply + 1)
+            score = -score
+            self.undo_move(move)
+            if score > best_score:
+                best_score = score
+                principal_variation = [move] + line
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+        return best_score, principal_variation
+
+    @staticmethod
+    def score_to_table(score, ply):
+        """
+        Mate scores are stored as the distance to mate from the stored position, rather than from the root.
+        """
+        if is_mate_score(score):
+            return score + ply if score > 0 else score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score, ply):
+        if is_mate_score(score):
+            return score - ply if score > 0 else score + ply
+        return score
+
+    def search(self, max_depth, limits=None, report=None):
+        """
+        Searches to depth 1, then 2, and so on up to max_depth, trying the principal variation of the last
+        iteration first. Returns (score, principal variation), with the score from White's point of view.
+
+        If limits (or the engine's own limits) stop the search part of the way through an iteration, the result of
+        the last completed iteration is returned. If not even depth 1 was completed, the first root move in move
+        order, which negamax keeps when depth 1 starts, is returned with the score of the position as it stands. A
+        search stopped before it got that far returns no move. stats() says how far the search got.
+
+        report, if given, is called with (depth, score, principal variation) after each completed iteration, with the
+        score from White's point of view, so that a caller can show the best move so far while the search goes on.
+        """
+        if limits is not None:
+            self.limits = limits
+        if self.limits is not None:
+            self.limits.start(self.nodes)
+        start_time = time.perf_counter()
+        start_nodes = self.nodes
+        moves_made = len(self.board.undo_stack)
+        self.completed_depth = 0
+        self.stop_reason = None
+        score = 0
+        try:
+            for depth in range(1, max_depth + 1):
+                depth_score, principal_variation = self.negamax(depth, -MATE_SCORE - 1, MATE_SCORE + 1, 0)
+                score = depth_score
+                self.completed_depth = depth
+                if principal_variation:
+                    self.principal_variation = principal_variation
+                if report is not None:
+                    report(depth, score if self.board.white_to_move else -score, self.principal_variation)
+                if is_mate_score(score):
+                    break
+        except SearchCancelled as cancelled:
+            self.stop_reason = cancelled.reason
+            while len(self.board.undo_stack) > moves_made:
+                self.board.undo_move()
+            if self.completed_depth == 0:
+                score = self.evaluate()
+        self.search_time = time.perf_counter() - start_time
+        self.search_nodes = self.nodes - start_nodes
+        return (score if self.board.white_to_move else -score), self.principal_variation
+
+    def stats(self):
+        """
+        Returns how far the last search got, as a dictionary: the deepest completed iteration, the positions searched,
+        the seconds taken and why it stopped early ("time", "nodes" or "cancelled"), or None if it did not.
+        """
+        return {"depth": self.completed_depth, "nodes": self.search_nodes, "seconds": self.search_time,
+                "stopped": self.stop_reason}
@@ -0,0 +1,202 @@
+"""
+A mate finder that works on a ChessBoard alone, so it can be run from scripts without a pygame window.
+
+It answers the same question as Game.mate_in: can the player to move force checkmate within depth of their own moves,
+if every one of those moves gives check? The search is iterative deepening, so the first mate it finds is the shortest.
+- On the attacker's turn, only moves that give check are tried, and one that mates is enough.
+- On the defender's turn, every reply has to lose, and the line follows the reply that holds out longest.
+
+Moves are made and undone on one board through an Engine, so double moves are single compound moves, the same way
+available_board_states returns them. Attacking positions are stored in a TranspositionTable:
+- an UPPER bound when there is no mate within the stored depth, so the position is not searched again
+- an EXACT entry with the number of moves to mate and the first move of the mate, which is tried first next time
+
+A search can be bounded by SearchLimits. If a limit is reached, mate_in stops and reports no mate, and
+completed_depth says up to which depth there is certainly none.
+
+Run from the command line:
+    python MateSearch.py 3 --board "..."    looks for a mate in up to 3 moves, with --black if it is Black's turn
+"""
+import argparse
+import time
+
+from ChessBoard import ChessBoard
+from Engine import Engine
+from MoveOrdering import MoveOrderer
+from SearchLimits import SearchCancelled, SearchLimits
+from TranspositionTable import *
+
+
+class MateSearch:
+    """
+    Searches a copy of the given board. The TranspositionTable and MoveOrderer can be kept between searches, like the
+    ones the BackgroundAnalysis worker keeps between requests.
+    """
+
+    def __init__(self, board, table=None, ordering=None, limits=None):
+        self.engine = Engine(board, ordering=MoveOrderer() if ordering is None else ordering)
+        self.board = self.engine.board
+        self.table = TranspositionTable() if table is None else table
+        self.ordering = self.engine.ordering
+        self.limits = limits
+        self.nodes = 0
+        self.completed_depth = 0
+        self.stop_reason = None
+
+    def gives_check(self, move):
+        """
+        Makes the move and returns True if it leaves the other player in check. The move is not undone.
+        """
+        self.engine.make_move(move)
+        return self.board.check_check(self.board.white_to_move)
+
+    def attack(self, depth, start_positions=None):
+        """
+        Looks for a mate in depth moves for the player to move. Returns the mating line, with the moves of both players,
+        or None if there is no mate where every attacking move gives check.
+        start_positions limits the first move to pieces on those positions. The result is not stored in that case, as
+        not every move was looked at.
+        """
+        self.nodes += 1
+        if self.limits is not None:
+            self.limits.check(self.nodes)
+        if depth == 0:
+            return None
+        board = self.board
+        key = board.position_hash
+        best_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            entry_depth, bound, score, best_move = entry
+            if bound == UPPER and entry_depth >= depth:
+                return None
+        moves = self.engine.generate_moves()
+        if start_positions is not None:
+            moves = [move for move in moves if move[0] in start_positions]
+        for move in self.ordering.order(board, moves, best_move=best_move):
+            line = self.defend(depth) if self.gives_check(move) else None
+            self.engine.undo_move(move)
+            if line is not None:
+                if start_positions is None:
+                    self.table.store(key, depth, EXACT, (len(line) + 2) // 2, move)
+                return [move] + line
+        if start_positions is None:
+            self.table.store(key, depth, UPPER, 0)
+        return None
+
+    def defend(self, depth):
+        """
+        The defender is in check, and the attacker has depth - 1 moves left after this one. Returns the longest line
+        to mate over the defender's replies, which is empty if the defender is already checkmated, or None if there is
+        a reply that escapes.
+        """
+        self.nodes += 1
+        if self.limits is not None:
+            self.limits.check(self.nodes)
+        moves = self.engine.generate_moves()
+        if not moves:
+            return []
+        if depth == 1:
+            return None
+        longest_line = None
+        for move in moves:
+            self.engine.make_move(move)
+            line = self.attack(depth - 1)
+            self.engine.undo_move(move)
+            if line is None:
+                return None
+            if longest_line is None or len(line) >= len(longest_line):
+                longest_line = [move] + line
+        return longest_line
+
+    def mate_in(self, max_depth, start_positions=None):
+        """
+        Looks for the shortest mate in up to max_depth moves for the player to move.
+        Returns (mating line, number of moves to mate) like Game.mate_in, or None if there is no mate, or the search
+        was stopped by self.limits before it found one.
+        """
+        if self.limits is not None:
+            self.limits.start(self.nodes)
+        moves_made = len(self.board.undo_stack)
+        self.completed_depth = 0
+        self.stop_reason = None
+        try:
+            for depth in range(1, max_depth + 1):
+                line = self.attack(depth, start_positions)
+                if line is not None:
+                    return line, depth
+                self.completed_depth = depth
+        except SearchCancelled as cancelled:
+            self.stop_reason = cancelled.reason
+            while len(self.board.undo_stack) > moves_made:
+                self.board.undo_move()
+        return None
+
+    def mate_after_reply(self, max_depth):
+        """
+        Like mate_in, but the player to move is the defender: looks for the shortest mate in up to max_depth moves that
+        the attacker has whatever the defender plays now. Returns (line, number of moves to mate), with the line
+        following the reply that holds out longest and starting with it, or None if a reply escapes, the defender has
+        no move, or the search was stopped by self.limits first.
+        """
+        if self.limits is not None:
+            self.limits.start(self.nodes)
+        moves_made = len(self.board.undo_stack)
+        self.completed_depth = 0
+        self.stop_reason = None
+        replies = self.engine.generate_moves()
+        if not replies:
+            return None
+        try:
+            for depth in range(1, max_depth + 1):
+                longest_line = None
+                for move in replies:
+                    self.engine.make_move(move)
+                    line = self.attack(depth)
+                    self.engine.undo_move(move)
+                    if line is None:
+                        break
+                    if longest_line is None or len(line) >= len(longest_line):
+                        longest_line = [move] + line
+                else:
+                    return longest_line, depth
+                self.completed_depth = depth
+        except SearchCancelled as cancelled:
+            self.stop_reason = cancelled.reason
+            while len(self.board.undo_stack) > moves_made:
+                self.board.undo_move()
+        return None
+
+
+def find_mate(board_state, white_to_move, max_depth, table=None, seconds=None):
+    """
+    Looks for the shortest mate from a board_state, giving up after seconds if it is given.
+    Returns (mating line, number of moves to mate), or None.
+    """
+    limits = None if seconds is None else SearchLimits(seconds)
+    return MateSearch(ChessBoard(board_state, white_to_move), table, limits=limits).mate_in(max_depth)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Looks for a forced mate in Chess+ where every move gives check.")
+    parser.add_argument("depth", type=int, help="the most moves the mate can take")
+    parser.add_argument("--board", required=True, help="the board_state to search")
+    parser.add_argument("--black", action="store_true", help="Black is to move")
+    parser.add_argument("--seconds", type=float, default=None, help="the most time to spend searching")
+    parser.add_argument("--nodes", type=int, default=None, help="the most positions to search")
+    arguments = parser.parse_args()
+
+    search = MateSearch(ChessBoard(arguments.board, not arguments.black),
+                        limits=SearchLimits(arguments.seconds, arguments.nodes))
+    start_time = time.perf_counter()
+    result = search.mate_in(arguments.depth)
+    elapsed = time.perf_counter() - start_time
+    if result is None and search.stop_reason is not None:
+        print(f"Stopped by the {search.stop_reason} limit, with no mate in {search.completed_depth}")
+    elif result is None:
+        print(f"No mate in {arguments.depth}")
+    else:
+        mating_line, moves_to_mate = result
+        print(f"Mate in {moves_to_mate}: " + ", ".join(" -> ".join(str(position) for position in move)
+                                                      for move in mating_line))
+    print(f"Searched {search.nodes} positions in {elapsed:.2f}s")
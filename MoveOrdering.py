@@ -0,0 +1,98 @@
+"""
+Move ordering for searches. Alpha-beta search prunes the most when the best move is tried first, so the MoveOrderer
+sorts moves by how promising they look:
+1. Captures, most valuable victim first and then least valuable attacker (MVV-LVA), using the Piece values
+2. Killer moves: quiet moves that caused a cutoff at the same ply in another part of the tree
+3. Every other move, by its history score: how often it has caused cutoffs anywhere in the tree
+
+Chess+ captures can also be worth more than the piece taken, so captures get a bonus when they duplicate a Blob, give
+a Dog (or Death, or a Chicken next to a Dog) a second move, or make a Chicken next to a Blob lay an Egg.
+"""
+from Pieces import *
+from PieceCodes import *
+
+DUPLICATION_BONUS = 2
+DOUBLE_MOVE_BONUS = 3
+EGG_BONUS = 1
+
+CAPTURE = 2
+KILLER = 1
+QUIET = 0
+
+
+class MoveOrderer:
+    """
+    Holds the killer and history tables, which persist across the iterations of an iterative deepening search.
+    Moves are tuples of 2 or 3 positions, like the moves from available_board_states.
+    """
+
+    def __init__(self, killers_per_ply=2):
+        self.killers_per_ply = killers_per_ply
+        self.killers = {}
+        self.history = {}
+
+    def capture_score(self, board, move):
+        """
+        The MVV-LVA score of a move, including the second capture of a compound move, or 0 for a quiet move.
+        """
+        attacker = board.code_in_position(move[0])
+        colour = attacker & BLACK
+        score = 0
+        for target in move[1:]:
+            victim = board.code_in_position(target)
+            if victim not in (EMPTY, OFF_BOARD) and victim & BLACK != colour:
+                score += abs(VALUES[victim]) * 16
+        if score == 0:
+            return 0
+        score -= abs(VALUES[attacker])
+        kind = attacker & KIND_MASK
+        if kind in (BLOB0, BLOB1, BLOB2):
+            score += DUPLICATION_BONUS * 16
+        elif kind in (DOG, DEATH):
+            score += DOUBLE_MOVE_BONUS * 16
+        elif kind == CHICKEN:
+            adjacent_pieces = board.adjacent_piece_types(move[0])
+            if Dog in adjacent_pieces:
+                score += DOUBLE_MOVE_BONUS * 16
+            if Blob0 in adjacent_pieces or Blob1 in adjacent_pieces or Blob2 in adjacent_pieces:
+                score += EGG_BONUS * 16
+        return score
+
+    def sort_key(self, board, move, ply=None):
+        """
+        A key for sorting moves, best first when sorted in reverse.
+        """
+        capture = self.capture_score(board, move)
+        if capture:
+            return CAPTURE, capture
+        if ply is not None and move in self.killers.get(ply, ()):
+            return KILLER, 0
+        return QUIET, self.history.get(move[:2], 0)
+
+    def order(self, board, moves, ply=None, best_move=None):
+        """
+        Returns the moves sorted best first. best_move (from a transposition table or an earlier iteration) always
+        goes first.
+        """
+        ordered = sorted(moves, key=lambda move: self.sort_key(board, move, ply), reverse=True)
+        if best_move is not None and best_move in ordered:
+            ordered.remove(best_move)
+            ordered.insert(0, best_move)
+        return ordered
+
+    def cutoff(self, board, move, ply, depth):
+        """
+        Records a quiet move that caused a beta cutoff, as a killer for its ply and in the history table.
+        board must be in the position before the move, so that captures can be told apart from quiet moves.
+        """
+        if self.capture_score(board, move):
+            return
+        killers = self.killers.setdefault(ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killers_per_ply:]
+        self.history[move[:2]] = self.history.get(move[:2], 0) + depth * depth
+
+    def clear(self):
+        self.killers = {}
+        self.history = {}
@@ -0,0 +1,174 @@
+"""
+Move tables for every piece, built once at import.
+
+The move methods in Pieces.py build a fresh list of positions on every call, including squares off the edge of the
+board. These tables hold the same moves as tuples of mailbox indices, already clipped to the board, so the ChessBoard
+can generate moves by reading them instead of calling the Piece methods.
+
+The tables are indexed by [piece code][mailbox index]:
+- MOVES and TAKES hold the single hops from moves() and takes()
+- DEPENDANT_MOVES and DEPENDANT_TAKES hold (target, dependancy) index pairs from dependant_moves()
+- MOVE_RAYS and TAKE_RAYS hold one tuple of indices per (direction, limit) ray from direction_moves(), nearest first
+
+The CHICKEN_ tables hold the moves a Chicken can inherit from the pieces next to it.
+"""
+from Pieces import *
+from PieceCodes import *
+
+CODES = 64
+
+
+def clip(positions):
+    """
+    Converts a list of positions into a tuple of mailbox indices, leaving out any that are off the board.
+    """
+    return tuple(to_index((row, col)) for row, col in positions if 0 <= row <= 9 and 0 <= col <= 9)
+
+
+def clip_pairs(pairs):
+    """
+    Converts (target, dependancy) position pairs into index pairs, leaving out pairs whose target is off the board.
+    The dependancy square is always between the piece and the target, so is on the board whenever the target is.
+    """
+    return tuple((to_index(move), to_index(dependancy)) for move, dependancy in pairs
+                 if 0 <= move[0] <= 9 and 0 <= move[1] <= 9)
+
+
+def ray(index, orientation, limit):
+    """
+    The indices reached by sliding from the index in one direction, stopping at the edge of the board.
+    """
+    step = DIRECTION_STEPS[orientation]
+    indices = []
+    for _ in range(limit):
+        index += step
+        if POSITIONS[index] is None:
+            break
+        indices.append(index)
+    return tuple(indices)
+
+
+def rays(index, directions):
+    """
+    The rays for a list of (direction, limit) pairs, leaving out any that start at the edge of the board.
+    """
+    all_rays = [ray(index, orientation, limit) for orientation, limit in directions]
+    return tuple(indices for indices in all_rays if indices)
+
+
+def _table(piece_class, is_white, method):
+    table = [()] * SIZE
+    for index in INDICES:
+        table[index] = method(piece_class(is_white, POSITIONS[index]), index)
+    return table
+
+
+MOVES = [None] * CODES
+TAKES = [None] * CODES
+DEPENDANT_MOVES = [None] * CODES
+DEPENDANT_TAKES = [None] * CODES
+MOVE_RAYS = [None] * CODES
+TAKE_RAYS = [None] * CODES
+for _kind in range(1, len(PIECE_CLASSES)):
+    for _is_white in (True, False):
+        _code = piece_code(_kind, _is_white)
+        _class = PIECE_CLASSES[_kind]
+        MOVES[_code] = _table(_class, _is_white, lambda piece, index: clip(piece.moves()))
+        TAKES[_code] = _table(_class, _is_white, lambda piece, index: clip(piece.takes()))
+        DEPENDANT_MOVES[_code] = _table(_class, _is_white, lambda piece, index: clip_pairs(piece.dependant_moves()))
+        DEPENDANT_TAKES[_code] = _table(_class, _is_white, lambda piece, index: clip_pairs(piece.dependant_takes()))
+        MOVE_RAYS[_code] = _table(_class, _is_white, lambda piece, index: rays(index, piece.direction_moves()))
+        TAKE_RAYS[_code] = _table(_class, _is_white, lambda piece, index: rays(index, piece.direction_takes()))
+
+# The Chicken tables that depend on colour are indexed by [Chicken code][index], the rest by [index]
+CHICKEN_PAWN_MOVES = [None] * CODES
+CHICKEN_PAWN_TAKES = [None] * CODES
+CHICKEN_PAWN_RAYS = [None] * CODES
+for _is_white in (True, False):
+    _code = piece_code(CHICKEN, _is_white)
+    CHICKEN_PAWN_MOVES[_code] = _table(Chicken, _is_white, lambda chicken, index: clip(chicken.pawn_moves()))
+    CHICKEN_PAWN_TAKES[_code] = _table(Chicken, _is_white, lambda chicken, index: clip(chicken.pawn_takes()))
+    # Only used while the Chicken has not moved
+    CHICKEN_PAWN_RAYS[_code] = _table(Chicken, _is_white,
+                                      lambda chicken, index: rays(index, chicken.pawn_direction_moves()))
+CHICKEN_KNIGHT_MOVES = _table(Chicken, True, lambda chicken, index: clip(chicken.knight_moves()))
+CHICKEN_FROG_MOVES = _table(Chicken, True, lambda chicken, index: clip(chicken.frog_moves()))
+CHICKEN_CLERIC_MOVES = _table(Chicken, True, lambda chicken, index: clip(chicken.cleric_moves()))
+CHICKEN_KING_MOVES = _table(Chicken, True, lambda chicken, index: clip(chicken.king_moves()))
+CHICKEN_BLOB0_DEPENDANT_MOVES = _table(Chicken, True, lambda chicken, index: clip_pairs(chicken.blob0_dependant_moves()))
+CHICKEN_ROOK_RAYS = _table(Chicken, True, lambda chicken, index: rays(index, chicken.rook_direction_moves()))
+CHICKEN_BISHOP_RAYS = _table(Chicken, True, lambda chicken, index: rays(index, chicken.bishop_direction_moves()))
+CHICKEN_BLOB_RAYS = [_table(Chicken, True, lambda chicken, index: rays(index, chicken.blob0_direction_moves())),
+                     _table(Chicken, True, lambda chicken, index: rays(index, chicken.blob1_direction_moves())),
+                     _table(Chicken, True, lambda chicken, index: rays(index, chicken.blob2_direction_moves())),
+                     _table(Chicken, True, lambda chicken, index: rays(index, chicken.blob3_direction_moves()))]
+
+# How expensive it is to find the legal moves of each piece kind, roughly the number of candidate moves that each need
+# a check test. Pieces that can double move come last, as each of their takes has to try every second move too.
+GENERATION_COST = [0] * 32
+for _kind, _cost in ((PAWN, 1), (BLOB3, 1), (KING, 2), (BLOB2, 2), (PANDA, 3), (BLOB1, 3), (BLOB0, 3), (KNIGHT, 3),
+                     (FROG, 4), (BISHOP, 5), (ROOK, 5), (QUEEN, 6), (CHICKEN, 7), (CLERIC, 8), (DOG, 9),
+                     (DEATH, 9)):
+    GENERATION_COST[_kind] = _cost
+
+# The tables below are for working outwards from a square to the pieces that could take on it. They hold steps
+# between mailbox indices, from the piece to the square it takes on, so they are the same for every square.
+_CENTRE = (5, 5)
+
+
+def steps(positions):
+    """
+    Converts the positions a piece in the centre of the board can reach into steps from its mailbox index.
+    """
+    return frozenset(to_index(position) - to_index(_CENTRE) for position in positions)
+
+
+def step_pairs(pairs):
+    """
+    The same as steps, for (target, dependancy) position pairs.
+    """
+    return tuple((to_index(move) - to_index(_CENTRE), to_index(dependancy) - to_index(_CENTRE))
+                 for move, dependancy in pairs)
+
+
+def reach(directions):
+    """
+    The furthest a piece can slide with each step, for a list of (direction, limit) pairs.
+    """
+    return {DIRECTION_STEPS[orientation]: limit for orientation, limit in directions}
+
+
+TAKE_STEPS = [frozenset()] * CODES
+TAKE_REACH = [{}] * CODES
+DEPENDANT_TAKE_STEPS = [()] * CODES
+for _kind in range(1, len(PIECE_CLASSES)):
+    for _is_white in (True, False):
+        _code = piece_code(_kind, _is_white)
+        _piece = PIECE_CLASSES[_kind](_is_white, _CENTRE)
+        TAKE_STEPS[_code] = steps(_piece.takes())
+        TAKE_REACH[_code] = reach(_piece.direction_takes())
+        DEPENDANT_TAKE_STEPS[_code] = step_pairs(_piece.dependant_takes())
+
+_chicken = Chicken(True, _CENTRE)
+CHICKEN_KNIGHT_STEPS = steps(_chicken.knight_moves())
+CHICKEN_FROG_STEPS = steps(_chicken.frog_moves())
+CHICKEN_BLOB0_DEPENDANT_STEPS = step_pairs(_chicken.blob0_dependant_moves())
+CHICKEN_ROOK_REACH = reach(_chicken.rook_direction_moves())
+CHICKEN_BISHOP_REACH = reach(_chicken.bishop_direction_moves())
+CHICKEN_BLOB_REACH = [reach(_chicken.blob0_direction_moves()), reach(_chicken.blob1_direction_moves()),
+                      reach(_chicken.blob2_direction_moves()), reach(_chicken.blob3_direction_moves())]
+# Every Chicken can take on the squares next to it
+CHICKEN_KING_REACH = dict.fromkeys(ADJACENT_STEPS, 1)
+
+# (step, codes that take with that step) for every step that a piece or a Chicken can take with
+HOP_ATTACKERS = tuple((step, frozenset(code for code in range(CODES) if step in TAKE_STEPS[code]))
+                      for step in sorted(frozenset().union(*TAKE_STEPS, CHICKEN_KNIGHT_STEPS, CHICKEN_FROG_STEPS)))
+# (step, dependancy step, codes) for every dependant take
+DEPENDANT_ATTACKERS = tuple((step, dependancy, frozenset(code for code in range(CODES)
+                                                         if (step, dependancy) in DEPENDANT_TAKE_STEPS[code]))
+                            for step, dependancy in sorted(set().union(*DEPENDANT_TAKE_STEPS)))
+
+# The en passant takes a Pawn (or a Chicken next to one) of each colour can make, as
+# (row of the square taken on, row of the taking piece, rows the en passantable Pawn can be on)
+EN_PASSANT_ATTACKS = {True: ((2, 3, (3, 4)), (3, 4, (4,))),
+                      False: ((7, 6, (6, 5)), (6, 5, (5,)))}
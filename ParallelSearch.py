@@ -0,0 +1,206 @@
+"""
+Searches the root moves of a position in parallel, on a pool of worker processes.
+
+Each root move is searched by one worker, with its own Engine. The best score found so far at the root is kept in a
+multiprocessing.Value that every worker reads before it starts and raises when it finds something better, so moves
+that are handed out later are searched with a narrower window, the same way the root of Engine.negamax raises alpha.
+The first root move is searched on its own before the rest are handed out, so that the others start with a real
+alpha instead of -MATE_SCORE.
+
+The pool is started once and reused by every search, so the workers only pay for importing ChessBoard (and with it
+pygame and numpy) when the pool starts. The workers all use one SharedTranspositionTable, so a position one worker has
+searched is not searched again by another, and each keeps its own MoveOrderer between the root moves it is given.
+
+A search can be bounded by SearchLimits, like Engine.search. The main process checks them every POLL_SECONDS while it
+waits for the workers, and once one is reached it sets an Event that every worker's search is cancelled by. The node
+budget is also handed to each root move search, less the nodes of the root moves that have already finished, so a
+search can go over it by at most what the other workers are in the middle of.
+"""
+import multiprocessing
+import os
+import time
+
+from Engine import Engine, MATE_SCORE, is_mate_score
+from MoveOrdering import MoveOrderer
+from SearchLimits import CancellationToken, SearchCancelled, SearchLimits
+from SharedTranspositionTable import SharedTranspositionTable
+
+# How often the main process checks the limits while it waits for the workers
+POLL_SECONDS = 0.02
+
+# Set in each worker process by _start_worker
+_shared_alpha = None
+_shared_nodes = None
+_stop = None
+_table = None
+_ordering = None
+
+
+def _start_worker(shared_alpha, shared_nodes, stop, table):
+    global _shared_alpha, _shared_nodes, _stop, _table, _ordering
+    _shared_alpha = shared_alpha
+    _shared_nodes = shared_nodes
+    _stop = stop
+    _table = table
+    _ordering = MoveOrderer()
+
+
+def _search_root_move(arguments):
+    """
+    Searches one root move to the given depth, stopping when the stop Event is set or node_budget runs out.
+    Returns (move, score, principal variation, nodes, stop reason, worker stats), with the score from the point of
+    view of the player making the move. A search that was stopped has no score or principal variation.
+    """
+    board, move, depth, node_budget = arguments
+    limits = SearchLimits(nodes=None if node_budget is None else node_budget - _shared_nodes.value,
+                          token=CancellationToken(_stop))
+    engine = Engine(board, _table, _ordering, limits=limits)
+    engine.make_move(move)
+    alpha = _shared_alpha.value
+    try:
+        score, line = engine.negamax(depth - 1, -MATE_SCORE - 1, -alpha, 1)
+    except SearchCancelled as cancelled:
+        # The engine's board is thrown away, so the moves it was in the middle of are not undone
+        with _shared_nodes.get_lock():
+            _shared_nodes.value += engine.nodes
+        return move, None, None, engine.nodes, cancelled.reason, (os.getpid(), _table.counters())
+    score = -score
+    with _shared_alpha.get_lock():
+        if score > _shared_alpha.value:
+            _shared_alpha.value = score
+    with _shared_nodes.get_lock():
+        _shared_nodes.value += engine.nodes
+    return move, score, [move] + line, engine.nodes, None, (os.getpid(), _table.counters())
+
+
+class ParallelSearch:
+    """
+    Holds the pool of workers and the table they share. processes defaults to the number of cores, and
+    table_megabytes is the size of the SharedTranspositionTable.
+
+    worker_stats holds the latest table counters of each worker, by process id.
+    Use close() (or a with block) to stop the workers and free the table once there is nothing left to search.
+    """
+
+    def __init__(self, processes=None, table_megabytes=16):
+        self.shared_alpha = multiprocessing.Value('i', -MATE_SCORE - 1)
+        self.shared_nodes = multiprocessing.Value('q', 0)
+        self.stop = multiprocessing.Event()
+        self.table = SharedTranspositionTable(table_megabytes)
+        self.pool = multiprocessing.Pool(processes, _start_worker,
+                                         (self.shared_alpha, self.shared_nodes, self.stop, self.table))
+        self.nodes = 0
+        self.principal_variation = []
+        self.completed_depth = 0
+        self.stop_reason = None
+        self.search_time = 0.0
+        self.worker_stats = {}
+
+    def gather(self, arguments, limits):
+        """
+        Hands out the root move searches and returns (move, score, principal variation) for each, in the order they
+        finish. While it waits, the limits are checked every POLL_SECONDS, and once one is reached the workers are
+        told to stop. Raises SearchCancelled when every search has come back, if any of them was stopped.
+        """
+        tasks = self.pool.imap_unordered(_search_root_move, arguments)
+        results = []
+        stop_reason = None
+        while True:
+            try:
+                move, score, line, nodes, reason, (worker, counters) = tasks.next(POLL_SECONDS)
+            except multiprocessing.TimeoutError:
+                reason = None
+            except StopIteration:
+                break
+            else:
+                self.nodes += nodes
+                self.worker_stats[worker] = counters
+                if reason is None:
+                    results.append((move, score, line))
+            if reason is None and limits is not None and stop_reason is None:
+                try:
+                    limits.check(self.shared_nodes.value)
+                except SearchCancelled as cancelled:
+                    reason = cancelled.reason
+            if reason is not None and stop_reason is None:
+                stop_reason = reason
+                self.stop.set()
+        if stop_reason is not None:
+            raise SearchCancelled(stop_reason)
+        return results
+
+    def search_depth(self, board, moves, depth, limits=None):
+        """
+        Searches every root move to depth, handing them out in the order given.
+        Returns {move: (score, principal variation)}, with scores for the player to move. A move that could not beat
+        the best score when it was searched gets an upper bound on its score, as in alpha-beta.
+        Raises SearchCancelled if the limits stop the search before every move has been searched.
+        """
+        self.shared_alpha.value = -MATE_SCORE - 1
+        node_budget = None if limits is None else limits.nodes
+        results = self.gather([(board, moves[0], depth, node_budget)], limits)
+        results.extend(self.gather([(board, move, depth, node_budget) for move in moves[1:]], limits))
+        return {move: (score, line) for move, score, line in results}
+
+    def search(self, board, max_depth, limits=None):
+        """
+        Searches to depth 1, then 2, and so on up to max_depth, trying the best moves of the last iteration first.
+        Returns (score, principal variation) like Engine.search, with the score from White's point of view.
+        self.nodes holds the number of positions the workers searched between them.
+
+        If limits stop the search, the result of the last completed iteration is returned, or the first root move in
+        move order with the score of the position as it stands if depth 1 was not completed. stats() says how far
+        the search got.
+        """
+        board = board.copy(history=False)
+        start_time = time.perf_counter()
+        self.nodes = 0
+        self.shared_nodes.value = 0
+        self.stop.clear()
+        self.principal_variation = []
+        self.completed_depth = 0
+        self.stop_reason = None
+        if limits is not None:
+            limits.start()
+        moves = Engine(board).generate_moves()
+        if not moves:
+            score = -MATE_SCORE if board.check_check(board.white_to_move) else 0
+            return (score if board.white_to_move else -score), []
+        moves = MoveOrderer().order(board, moves)
+
+        score = 0
+        try:
+            for depth in range(1, max_depth + 1):
+                lines = self.search_depth(board, moves, depth, limits)
+                # Ties go to the move that was searched first
+                moves.sort(key=lambda move: lines[move][0], reverse=True)
+                score, self.principal_variation = lines[moves[0]]
+                self.completed_depth = depth
+                if is_mate_score(score):
+                    break
+        except SearchCancelled as cancelled:
+            self.stop_reason = cancelled.reason
+            if self.completed_depth == 0:
+                value = board.current_value()
+                score = value if board.white_to_move else -value
+                self.principal_variation = moves[:1]
+        self.search_time = time.perf_counter() - start_time
+        return (score if board.white_to_move else -score), self.principal_variation
+
+    def stats(self):
+        """
+        Returns how far the last search got, in the same form as Engine.stats.
+        """
+        return {"depth": self.completed_depth, "nodes": self.nodes, "seconds": self.search_time,
+                "stopped": self.stop_reason}
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        self.table.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
@@ -0,0 +1,142 @@
+"""
+Perft (performance test) for Chess+ move generation.
+
+perft counts the positions reached by every sequence of legal moves to a given depth. The counts only change if the
+rules that move generation follows change, so they are a check that a change to ChessBoard has not changed which
+moves are legal. Moves are made and undone through the Engine, so double moves are counted as one compound move
+(start_position, middle_position, end_position), the same way available_board_states returns them.
+
+Run from the command line:
+    python Perft.py 3                   the start position to depth 3, divided by root move
+    python Perft.py 2 --board "..."     any board_state, with --black if it is Black's turn
+    python Perft.py --check             compares every position in REFERENCE_COUNTS with its stored counts
+"""
+import argparse
+import sys
+import time
+
+from ChessBoard import ChessBoard
+from Engine import Engine
+
+START_BOARD_STATE = "RDOZAKCFDRPPPPPPPPPP                                                            pppppppppprdozakcfdr"
+
+# name -> (board_state, white_to_move, {depth: number of positions}), for the start position and the common_boards in
+# playGame.py. "We ball" is left out, as it is a new random board every time. Each depth 1 count is the length of
+# available_board_states, and each depth 2 count is the sum of len(available_board_states()) over the boards it
+# returns. Start at depth 3 takes a few minutes, so use --max-depth 2 for a quick check.
+REFERENCE_COUNTS = {
+    "Start": (START_BOARD_STATE, True, {1: 100, 2: 9949, 3: 1002771}),
+    "Panda End Game": ("    KA       PPPP   "
+                       "                                                            "
+                       "   pppp       ka    ", True, {1: 15, 2: 225, 3: 3497, 4: 54323}),
+    "Chicken Hell": ("HHHCKADHHHHHHHHHHHHH"
+                     "                    HHHHHHHHHHhhhhhhhhhh                    "
+                     "hhhhhhhhhhhhhckadhhh", True, {1: 710}),
+    "Chicken Line": ("K        h         hhhhhhhhhhhh         hhhhhhhhhh         "
+                     "hhhhhhhhhhhh         hhhhhhhh k         r", True, {1: 14, 2: 4, 3: 877, 4: 1636}),
+    "Back to Basics": ("####################RNBQKBNR##PPPPPPPP##        ##        "
+                       "##        ##        ##pppppppp##rnbqkbnr##", True, {1: 28, 2: 336, 3: 9944, 4: 146465}),
+    "I sure do wonder": ("k  K      q  Q      k  K", True, {1: 15, 2: 263, 3: 6108}),
+    "No mate in 1": ("R HZAKC DR PP   PPPP      F   P  xP      D  hfc     pdx    "
+                     "          h         ppp pppppp r   ak  dr", True, {1: 183, 2: 18171}),
+}
+
+
+def count_positions(engine, depth):
+    """
+    The number of positions depth moves on from the engine's board, making and undoing the moves on it.
+    """
+    if depth == 0:
+        return 1
+    moves = engine.generate_moves()
+    if depth == 1:
+        return len(moves)
+    total = 0
+    for move in moves:
+        engine.make_move(move)
+        total += count_positions(engine, depth - 1)
+        engine.undo_move(move)
+    return total
+
+
+def perft(board, depth):
+    """
+    The number of positions reached by every sequence of depth legal moves from the board. The board is not changed.
+    """
+    return count_positions(Engine(board), depth)
+
+
+def divide(board, depth):
+    """
+    Returns a dictionary of root move -> the number of positions depth - 1 moves on from it.
+    """
+    engine = Engine(board)
+    counts = {}
+    for move in engine.generate_moves():
+        engine.make_move(move)
+        counts[move] = count_positions(engine, depth - 1)
+        engine.undo_move(move)
+    return counts
+
+
+def move_text(move):
+    return " -> ".join(str(position) for position in move)
+
+
+def run(board, depth, show_divide=True):
+    """
+    Prints the count for each root move (if show_divide is True), then the total, the time taken and the positions
+    per second. Returns the total.
+    """
+    start_time = time.perf_counter()
+    if show_divide and depth > 0:
+        counts = divide(board, depth)
+        for move, count in sorted(counts.items()):
+            print(f"{move_text(move)}: {count}")
+        total = sum(counts.values())
+    else:
+        total = perft(board, depth)
+    elapsed = time.perf_counter() - start_time
+    print(f"Depth {depth}: {total} positions in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} positions/s)")
+    return total
+
+
+def check_reference_counts(max_depth=None):
+    """
+    Runs perft on every position in REFERENCE_COUNTS, up to max_depth if it is given, and prints each result.
+    Returns a list of (name, depth, expected, found) for every count that has changed.
+    """
+    changed = []
+    for name, (board_state, white_to_move, counts) in REFERENCE_COUNTS.items():
+        board = ChessBoard(board_state, white_to_move)
+        for depth, expected in sorted(counts.items()):
+            if max_depth is not None and depth > max_depth:
+                continue
+            start_time = time.perf_counter()
+            found = perft(board, depth)
+            elapsed = time.perf_counter() - start_time
+            status = "ok" if found == expected else f"CHANGED (expected {expected})"
+            print(f"{name}, depth {depth}: {found} in {elapsed:.2f}s {status}")
+            if found != expected:
+                changed.append((name, depth, expected, found))
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts the positions reachable in Chess+ to a given depth.")
+    parser.add_argument("depth", type=int, nargs="?", default=2)
+    parser.add_argument("--board", default=START_BOARD_STATE, help="the board_state to start from")
+    parser.add_argument("--black", action="store_true", help="Black is to move")
+    parser.add_argument("--no-divide", action="store_true", help="only print the total")
+    parser.add_argument("--check", action="store_true", help="compare against REFERENCE_COUNTS")
+    parser.add_argument("--max-depth", type=int, default=None, help="the deepest reference count to check")
+    arguments = parser.parse_args()
+
+    if arguments.check:
+        changed_counts = check_reference_counts(arguments.max_depth)
+        if changed_counts:
+            print(f"{len(changed_counts)} count(s) changed")
+            sys.exit(1)
+        print("All counts match")
+    else:
+        run(ChessBoard(arguments.board, not arguments.black), arguments.depth, not arguments.no_divide)
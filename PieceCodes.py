@@ -0,0 +1,178 @@
+"""
+The ChessBoard stores its pieces in a flat, padded mailbox rather than a list of lists of Piece objects.
+
+The 10x10 board sits in the middle of a 16x16 bytearray, surrounded by 3 squares of OFF_BOARD sentinels.
+3 squares of padding is enough for the longest leaper (the Frog), so any single hop from a square on the board lands
+either on the board or on a sentinel, and never has to be bounds-checked by hand.
+
+Each square holds a one-byte piece code: the piece kind in the low 5 bits, plus the BLACK bit for black pieces.
+Per-piece state (has_moved, invulnerable, en passant, egg hatch timers) is kept in a side table of flags with the
+same layout as the mailbox.
+"""
+from Pieces import *
+
+WIDTH = 16
+PADDING = 3
+SIZE = WIDTH * WIDTH
+
+EMPTY = 0
+OFF_BOARD = 255
+BLACK = 32
+KIND_MASK = 31
+
+PAWN, ROOK, BISHOP, KING, KNIGHT, PANDA, QUEEN, FROG, DOG, BLOB0, BLOB1, BLOB2, BLOB3, CLERIC, CHICKEN, EGG, WALL, \
+    DEATH = range(1, 19)
+
+# Indexed by piece kind. The empty square maps to NoneType, so that adjacent_piece_types matches type(None)
+PIECE_CLASSES = (type(None), Pawn, Rook, Bishop, King, Knight, Panda, Queen, Frog, Dog, Blob0, Blob1, Blob2, Blob3,
+                 Cleric, Chicken, Egg, Wall, Death)
+KINDS = {piece_class: kind for kind, piece_class in enumerate(PIECE_CLASSES) if kind != EMPTY}
+
+HAS_MOVED = 1
+INVULNERABLE = 2
+EN_PASSANTABLE = 4
+HATCH_SHIFT = 4
+HATCH_MASK = 7 << HATCH_SHIFT
+# Any of these flags means that tick() has something to do for the piece
+TIMERS = INVULNERABLE | EN_PASSANTABLE | HATCH_MASK
+
+DIRECTION_STEPS = {"N": -WIDTH, "NE": 1 - WIDTH, "E": 1, "SE": WIDTH + 1,
+                   "S": WIDTH, "SW": WIDTH - 1, "W": -1, "NW": -WIDTH - 1}
+ADJACENT_STEPS = tuple(DIRECTION_STEPS.values())
+
+
+def to_index(position):
+    """
+    Converts a (row, col) position into its index in the mailbox.
+    Only valid for positions on the board or within the padding around it.
+    """
+    return (position[0] + PADDING) * WIDTH + position[1] + PADDING
+
+
+# The mailbox index of every square on the board, in the same order as a board_state
+INDICES = tuple(to_index((row, col)) for row in range(10) for col in range(10))
+
+# The (row, col) position for every mailbox index, or None for the padding
+POSITIONS = [None] * SIZE
+for _row in range(10):
+    for _col in range(10):
+        POSITIONS[to_index((_row, _col))] = (_row, _col)
+
+# The number of every square on the board (row * 10 + col), as used by board_state and features, or None for the padding
+SQUARE_NUMBERS = [None] * SIZE
+for _number, _index in enumerate(INDICES):
+    SQUARE_NUMBERS[_index] = _number
+
+EMPTY_MAILBOX = bytes(EMPTY if position is not None else OFF_BOARD for position in POSITIONS)
+
+
+def piece_code(kind, is_white):
+    return kind if is_white else kind | BLACK
+
+
+def is_white_code(code):
+    return not code & BLACK
+
+
+# The code of every piece of each colour
+COLOUR_CODES = {is_white: tuple(piece_code(kind, is_white) for kind in range(1, len(PIECE_CLASSES)))
+                for is_white in (True, False)}
+
+
+def encode(piece):
+    """
+    Turns a Piece object into its (code, flags) pair for the mailbox.
+    """
+    flags = 0
+    if piece.has_moved:
+        flags |= HAS_MOVED
+    if piece.invulnerable:
+        flags |= INVULNERABLE
+    if piece.is_en_passantable:
+        flags |= EN_PASSANTABLE
+    if type(piece) is Egg:
+        flags |= piece.timeUntilHatch << HATCH_SHIFT
+    return piece_code(KINDS[type(piece)], piece.is_white), flags
+
+
+def decode(code, flags, position):
+    """
+    Builds a Piece object for a mailbox square. This is the reverse of encode.
+    """
+    piece = PIECE_CLASSES[code & KIND_MASK](is_white_code(code), position)
+    piece.has_moved = bool(flags & HAS_MOVED)
+    piece.invulnerable = bool(flags & INVULNERABLE)
+    piece.is_en_passantable = bool(flags & EN_PASSANTABLE)
+    if type(piece) is Egg:
+        piece.timeUntilHatch = flags >> HATCH_SHIFT
+    return piece
+
+
+_CHARS = {(EMPTY, 0): " "}
+
+
+def code_char(code, flags):
+    """
+    Returns the board_state character for a mailbox square.
+    The characters come from Piece.as_char(), and are cached per (code, flags) pair.
+    """
+    try:
+        return _CHARS[code, flags]
+    except KeyError:
+        char = _CHARS[code, flags] = decode(code, flags, (0, 0)).as_char()
+        return char
+
+
+def board_state_square(code, flags, row):
+    """
+    The (code, flags) pair a square ends up with after going through board_state() and set_board_state(), which only
+    keep what its character shows. Pawns on their starting row always count as moved, and every Wall is white.
+    """
+    char = code_char(code, flags)
+    if char in "pP" and row == (8 if is_white_code(code) else 1):
+        return code, HAS_MOVED
+    return CHAR_CODES[char]
+
+
+# The (code, flags) pair for every character that set_board_state understands
+CHAR_CODES = {}
+for _char, _kind, _flags in (("p", PAWN, 0), ("e", PAWN, EN_PASSANTABLE), ("r", ROOK, 0), ("m", ROOK, HAS_MOVED),
+                             ("n", KNIGHT, 0), ("d", DOG, 0), ("f", FROG, 0), ("z", BLOB0, 0), ("x", BLOB1, 0),
+                             ("v", BLOB2, 0), ("j", BLOB3, 0), ("q", QUEEN, 0), ("a", PANDA, 0),
+                             ("i", PANDA, INVULNERABLE), ("h", CHICKEN, HAS_MOVED),
+                             ("y", CHICKEN, INVULNERABLE | HAS_MOVED), ("o", CHICKEN, 0), ("w", CHICKEN, 0),
+                             ("g", EGG, 6 << HATCH_SHIFT), ("b", BISHOP, 0), ("c", CLERIC, 0), ("k", KING, 0)):
+    CHAR_CODES[_char] = (piece_code(_kind, True), _flags)
+    CHAR_CODES[_char.upper()] = (piece_code(_kind, False), _flags)
+CHAR_CODES["("] = (piece_code(KING, True), HAS_MOVED)
+CHAR_CODES[")"] = (piece_code(KING, False), HAS_MOVED)
+CHAR_CODES["#"] = (piece_code(WALL, True), INVULNERABLE)
+CHAR_CODES["8"] = (piece_code(DEATH, True), 0)
+CHAR_CODES["*"] = (piece_code(DEATH, False), 0)
+for _time in range(1, 7):
+    CHAR_CODES["0123456"[_time]] = (piece_code(EGG, True), _time << HATCH_SHIFT)
+    CHAR_CODES[')!"£$%^'[_time]] = (piece_code(EGG, False), _time << HATCH_SHIFT)
+
+# Per-code lookup tables, taken from a prototype of each piece so that they always agree with Pieces.py
+VALUES = [0] * 256
+FEATURE_INTS = [0] * 256
+for _kind in range(1, len(PIECE_CLASSES)):
+    for _is_white in (True, False):
+        _prototype = PIECE_CLASSES[_kind](_is_white, (0, 0))
+        VALUES[piece_code(_kind, _is_white)] = _prototype.game_value()
+        FEATURE_INTS[piece_code(_kind, _is_white)] = _prototype.feature_int
+
+_MATCHING_CODES = {}
+
+
+def codes_of(is_white, piece_type):
+    """
+    Returns the set of codes belonging to pieces of the given colour that are instances of piece_type
+    """
+    try:
+        return _MATCHING_CODES[is_white, piece_type]
+    except KeyError:
+        codes = _MATCHING_CODES[is_white, piece_type] = frozenset(
+            piece_code(kind, is_white) for kind in range(1, len(PIECE_CLASSES))
+            if issubclass(PIECE_CLASSES[kind], piece_type))
+        return codes
@@ -1,7 +1,14 @@
 class Piece:
     """
     Abstract Class: is never actually called, only inherited by other Piece objects.
+
+    Pieces use __slots__, so that the many short-lived Piece objects a search builds are small and quick to make.
+    Anything that is the same for every piece of a type (value and feature_int) is a class attribute instead.
     """
+    __slots__ = ("is_white", "position", "has_moved", "invulnerable", "is_en_passantable")
+    value = 0
+    # The feature_int of a (black, white) piece, indexed by is_white
+    feature_ints = (0, 0)
 
     def __init__(self, is_white, position):
         """
@@ -12,8 +19,10 @@ class Piece:
         self.has_moved = False
         self.invulnerable = False
         self.is_en_passantable = False
-        self.value = 0
-        self.feature_int = 0
+
+    @property
+    def feature_int(self):
+        return self.feature_ints[self.is_white]
 
     def game_value(self):
         """
@@ -90,10 +99,9 @@ class Piece:
 
 
 class Pawn(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 1
-        self.feature_int = 1 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 1
+    feature_ints = (18, 1)
 
     def moves(self):
         row, col = self.position
@@ -142,10 +150,9 @@ class Pawn(Piece):
 
 
 class Rook(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 5
-        self.feature_int = 2 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 5
+    feature_ints = (19, 2)
 
     def direction_moves(self):
         return [("N", 10), ("E", 10), ("S", 10), ("W", 10)]
@@ -162,10 +169,9 @@ class Rook(Piece):
 
 
 class Bishop(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 3
-        self.feature_int = 3 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 3
+    feature_ints = (20, 3)
 
     def direction_moves(self):
         return [("NE", 10), ("SE", 10), ("SW", 10), ("NW", 10)]
@@ -182,10 +188,9 @@ class Bishop(Piece):
 
 
 class King(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 0
-        self.feature_int = 4 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 0
+    feature_ints = (21, 4)
 
     def moves(self):
         row, col = self.position
@@ -205,10 +210,9 @@ class King(Piece):
 
 
 class Knight(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 3
-        self.feature_int = 5 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 3
+    feature_ints = (22, 5)
 
     def string(self):
         return self.colour_case() + "Knight "
@@ -229,10 +233,9 @@ class Knight(Piece):
 
 
 class Panda(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 3
-        self.feature_int = 6 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 3
+    feature_ints = (23, 6)
 
     def string(self):
         return self.colour_case() + "Panda  "
@@ -267,9 +270,8 @@ class Panda(Piece):
 
 
 class Queen(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 7
+    __slots__ = ()
+    value = 7
 
     def string(self):
         return self.colour_case() + "Queen  "
@@ -286,10 +288,9 @@ class Queen(Piece):
 
 
 class Frog(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 6
-        self.feature_int = 7 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 6
+    feature_ints = (24, 7)
 
     def string(self):
         return self.colour_case() + "Frog   "
@@ -313,10 +314,9 @@ class Frog(Piece):
 
 
 class Dog(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 10
-        self.feature_int = 8 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 10
+    feature_ints = (25, 8)
 
     def string(self):
         return self.colour_case() + "Dog    "
@@ -337,10 +337,9 @@ class Dog(Piece):
 
 
 class Blob0(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 8
-        self.feature_int = 9 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 8
+    feature_ints = (26, 9)
 
     def string(self):
         return self.colour_case() + "Blob0  "
@@ -369,10 +368,9 @@ class Blob0(Piece):
 
 
 class Blob1(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 4
-        self.feature_int = 10 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 4
+    feature_ints = (27, 10)
 
     def string(self):
         return self.colour_case() + "Blob1  "
@@ -389,10 +387,9 @@ class Blob1(Piece):
 
 
 class Blob2(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 2
-        self.feature_int = 11 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 2
+    feature_ints = (28, 11)
 
     def string(self):
         return self.colour_case() + "Blob2  "
@@ -409,10 +406,9 @@ class Blob2(Piece):
 
 
 class Blob3(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 1
-        self.feature_int = 12 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 1
+    feature_ints = (29, 12)
 
     def string(self):
         return self.colour_case() + "Blob3  "
@@ -429,10 +425,9 @@ class Blob3(Piece):
 
 
 class Cleric(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 5
-        self.feature_int = 2 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 5
+    feature_ints = (19, 2)
 
     def direction_moves(self):
         return [("NE", 10), ("SE", 10), ("SW", 10), ("NW", 10)]
@@ -463,10 +458,9 @@ class Chicken(Piece):
     The chicken simply has many available methods for each piece it could inherit.
     """
 
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 3
-        self.feature_int = 13 + (17 if not is_white else 0)
+    __slots__ = ()
+    value = 3
+    feature_ints = (30, 13)
 
     def pawn_moves(self):
         row, col = self.position
@@ -573,11 +567,14 @@ class Chicken(Piece):
 
 
 class Egg(Piece):
+    __slots__ = ("timeUntilHatch",)
+    value = 1
+    # 14 plus half the hatch time of a new Egg, which stays the same as the Egg ticks down
+    feature_ints = (34, 17)
+
     def __init__(self, is_white, position):
         super().__init__(is_white, position)
-        self.value = 1
         self.timeUntilHatch = 6
-        self.feature_int = 14 + int(self.timeUntilHatch / 2) + (17 if not is_white else 0)
 
     def string(self):
         return self.colour_case() + "Egg    "
@@ -594,7 +591,7 @@ class Egg(Piece):
             return Chicken(is_white=self.is_white, position=self.position)
 
     def char_to_hatch_time(self, char):
-        char_dict = {"6": 6, "5": 5, "4": 4, "3": 3, "2": 2, "1": 1, "0": 0, "^": 6, "%": 5, "$": 4, "£": 3, '"': 1,
+        char_dict = {"6": 6, "5": 5, "4": 4, "3": 3, "2": 2, "1": 1, "0": 0, "^": 6, "%": 5, "$": 4, "£": 3, '"': 2,
                      "!": 1, ")": 0}
         self.timeUntilHatch = char_dict[char]
 
@@ -604,6 +601,8 @@ class Egg(Piece):
 
 
 class Wall(Piece):
+    __slots__ = ()
+
     def __init__(self, is_white, position):
         super().__init__(is_white, position)
         self.invulnerable = True
@@ -617,9 +616,8 @@ class Wall(Piece):
 
 
 class Death(Piece):
-    def __init__(self, is_white, position):
-        super().__init__(is_white, position)
-        self.value = 100
+    __slots__ = ()
+    value = 100
 
     def string(self):
         return self.colour_case() + "Death  "
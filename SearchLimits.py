@@ -0,0 +1,71 @@
+"""
+Limits for bounding a search: a wall-clock budget, a node budget and a cancellation token.
+
+A search calls SearchLimits.check with its node count at every position it visits, which raises SearchCancelled as
+soon as any of the limits is reached. The search catches it at the top, undoes the moves it was in the middle of, and
+returns what it found in the last iteration it completed.
+"""
+import threading
+import time
+
+
+class SearchCancelled(Exception):
+    """
+    Raised inside a search when it has to stop. reason is "time", "nodes" or "cancelled".
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    Lets another thread (or process) stop a search. event can be anything with set() and is_set(), like a
+    multiprocessing.Event for a search running in another process. By default it is a threading.Event.
+    """
+
+    def __init__(self, event=None):
+        self.event = threading.Event() if event is None else event
+
+    def cancel(self):
+        self.event.set()
+
+    @property
+    def cancelled(self):
+        return self.event.is_set()
+
+
+class SearchLimits:
+    """
+    seconds and nodes are the budgets for one search, and either can be None for no limit.
+    The budgets are counted from start(), which the search calls when it begins.
+    """
+
+    def __init__(self, seconds=None, nodes=None, token=None):
+        self.seconds = seconds
+        self.nodes = nodes
+        self.token = token
+        self.start()
+
+    def start(self, nodes=0):
+        """
+        Starts the clock, with nodes being the node count of the search at the start.
+        """
+        self.start_time = time.perf_counter()
+        self.deadline = None if self.seconds is None else self.start_time + self.seconds
+        self.start_nodes = nodes
+
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    def check(self, nodes):
+        """
+        Raises SearchCancelled if the search has used up a budget or been cancelled.
+        """
+        if self.nodes is not None and nodes - self.start_nodes >= self.nodes:
+            raise SearchCancelled("nodes")
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchCancelled("time")
+        if self.token is not None and self.token.cancelled:
+            raise SearchCancelled("cancelled")
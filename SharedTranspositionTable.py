@@ -0,0 +1,198 @@
+"""
+A transposition table in shared memory, for several search processes to probe and store in at the same time.
+
+It has the same interface and replacement policy as TranspositionTable, with two slots per bucket (depth-preferred
+and always-replace), but each slot is packed into two 64-bit words in a multiprocessing.shared_memory block:
+- data holds the depth, bound type, score and packed best move
+- check holds the position hash XORed with data
+
+There are no locks. A slot is only used if check XOR data gives back the hash being probed, so a slot that two
+processes wrote at the same time, or that a worker died halfway through writing, reads as a miss instead of giving
+one position's score to another. Nothing outside that slot is touched by a write.
+
+The hit, miss, collision, store and overwrite counters are kept by each process for its own probes and stores.
+"""
+from multiprocessing import shared_memory
+
+from TranspositionTable import encode_move, decode_move
+
+MOVE_BITS = 21
+BOUND_SHIFT = MOVE_BITS
+DEPTH_SHIFT = BOUND_SHIFT + 2
+SCORE_SHIFT = DEPTH_SHIFT + 8
+SCORE_OFFSET = 1 << 31
+
+
+def pack_entry(depth, bound, score, packed_move):
+    """
+    Packs an entry into 63 bits: the move in the lowest 21, then 2 for the bound, 8 for the depth and 32 for the score.
+    """
+    return ((score + SCORE_OFFSET) << SCORE_SHIFT | min(depth, 255) << DEPTH_SHIFT | bound << BOUND_SHIFT |
+            packed_move)
+
+
+def unpack_entry(data):
+    """
+    Returns (depth, bound, score, packed_move), the reverse of pack_entry.
+    """
+    return ((data >> DEPTH_SHIFT) & 255, (data >> BOUND_SHIFT) & 3, (data >> SCORE_SHIFT) - SCORE_OFFSET,
+            data & ((1 << MOVE_BITS) - 1))
+
+
+class SharedTranspositionTable:
+    """
+    Made with a memory budget in the process that owns the table, which should call unlink() when every process has
+    finished with it. Other processes get the table by being passed it (it pickles as the name of its shared memory),
+    or by making one with the name of an existing table. They should be started by the owner, so that they share its
+    resource tracker, which would otherwise free the shared memory when they exit.
+    """
+
+    # The bytes used by one slot: the check word and the data word
+    SLOT_SIZE = 16
+
+    def __init__(self, megabytes=16, name=None):
+        """
+        megabytes is the memory budget for the table, and the number of buckets is the largest power of 2 that fits in
+        it. If name is given, the table is attached to the shared memory of an existing table instead.
+        """
+        if name is None:
+            buckets = 1
+            while buckets * 4 * self.SLOT_SIZE <= megabytes * 1024 * 1024:
+                buckets *= 2
+            self.memory = shared_memory.SharedMemory(create=True, size=buckets * 2 * self.SLOT_SIZE)
+            self.owner = True
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.setup()
+        if self.owner:
+            self.clear()
+
+    def setup(self):
+        self.entries = self.memory.buf.cast('Q')
+        # The block can be larger than asked for, as it is rounded up to a whole number of pages
+        slots = 1
+        while slots * 2 * self.SLOT_SIZE <= self.memory.size:
+            slots *= 2
+        self.mask = slots // 2 - 1
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __getstate__(self):
+        return {"name": self.memory.name}
+
+    def __setstate__(self, state):
+        self.memory = shared_memory.SharedMemory(name=state["name"])
+        self.owner = False
+        self.setup()
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def clear(self):
+        """
+        Empties the table for every process using it, and resets this process's counters.
+        """
+        self.memory.buf[:] = bytes(self.memory.size)
+        self.reset_counters()
+
+    def __len__(self):
+        """
+        The number of slots in the table.
+        """
+        return 2 * (self.mask + 1)
+
+    def read(self, slot):
+        """
+        Returns (key, data) for a slot. A slot that is empty or was torn by two writes at once gives a key that matches
+        no position, which is 0 for an empty slot.
+        """
+        data = self.entries[2 * slot + 1]
+        return self.entries[2 * slot] ^ data, data
+
+    def write(self, slot, key, data):
+        self.entries[2 * slot + 1] = data
+        self.entries[2 * slot] = key ^ data
+
+    def probe(self, key):
+        """
+        Looks up a position hash. Returns (depth, bound, score, best_move), or None if the position is not stored.
+        """
+        slot = (key & self.mask) * 2
+        first_key, data = self.read(slot)
+        if key == 0 or first_key != key:
+            second_key, data = self.read(slot + 1)
+            if key == 0 or second_key != key:
+                self.misses += 1
+                if first_key or second_key:
+                    self.collisions += 1
+                return None
+        self.hits += 1
+        depth, bound, score, packed_move = unpack_entry(data)
+        return depth, bound, score, decode_move(packed_move)
+
+    def store(self, key, depth, bound, score, best_move=None):
+        """
+        Stores what a search found for a position hash, following the same replacement policy as TranspositionTable.
+        """
+        self.stores += 1
+        slot = (key & self.mask) * 2
+        first_key, first_data = self.read(slot)
+        if first_key == key or first_key == 0 or depth >= unpack_entry(first_data)[0]:
+            if first_key != key and first_key != 0:
+                # The entry that loses the depth-preferred slot still goes in the always-replace slot
+                if self.read(slot + 1)[0] not in (0, first_key):
+                    self.overwrites += 1
+                self.write(slot + 1, first_key, first_data)
+            elif self.read(slot + 1)[0] == key:
+                self.write(slot + 1, 0, 0)
+        else:
+            slot += 1
+            if self.read(slot)[0] not in (0, key):
+                self.overwrites += 1
+        self.write(slot, key, pack_entry(depth, bound, score, encode_move(best_move)))
+
+    def counters(self):
+        """
+        Returns this process's counters as a dictionary, with its hit rate.
+        """
+        probes = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "stores": self.stores,
+                "overwrites": self.overwrites, "hit_rate": self.hits / probes if probes else 0.0}
+
+    def stats(self):
+        """
+        Returns counters() along with how full the table is, which counts the entries of every process.
+        """
+        stats = self.counters()
+        stats["filled"] = sum(1 for slot in range(len(self)) if self.entries[2 * slot + 1]) / len(self)
+        return stats
+
+    def close(self):
+        """
+        Detaches this process from the table.
+        """
+        self.entries.release()
+        self.memory.close()
+
+    def __del__(self):
+        # The shared memory cannot be closed while self.entries still points into it, which it would otherwise try to
+        # do when a worker that never called close() exits
+        entries = getattr(self, "entries", None)
+        if entries is not None:
+            entries.release()
+
+    def unlink(self):
+        """
+        Detaches from the table and frees the shared memory. Only for the process that made the table.
+        """
+        self.close()
+        if self.owner:
+            self.memory.unlink()
@@ -0,0 +1,139 @@
+"""
+A fixed-size transposition table for searching Chess+ positions.
+
+Dog double moves, Blob duplication and Chicken inheritance mean that the same position is often reached through
+different move orders. The table remembers what a search found out about a position, keyed by its Zobrist hash
+(ChessBoard.position_hash), so that it does not have to be searched again.
+
+Entries are kept in flat arrays rather than Python objects, so that the table has a fixed size set by its memory
+budget. Each bucket has two slots:
+- a depth-preferred slot, which keeps the entry searched to the greatest depth
+- an always-replace slot, which takes every entry that is not deep enough for the first slot
+"""
+from array import array
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def encode_move(move):
+    """
+    Packs a move of 2 or 3 positions, like (start_position, end_position), into an int. 0 means no move.
+    """
+    if move is None:
+        return 0
+    packed = 0
+    for shift, (row, col) in enumerate(move):
+        packed |= (row * 10 + col + 1) << (7 * shift)
+    return packed
+
+
+def decode_move(packed):
+    """
+    The reverse of encode_move.
+    """
+    if packed == 0:
+        return None
+    move = []
+    while packed:
+        move.append(divmod((packed & 127) - 1, 10))
+        packed >>= 7
+    return tuple(move)
+
+
+class TranspositionTable:
+    """
+    Stores the depth, bound type, score and best move found for a position hash.
+
+    The bound type says what the score means: EXACT for a true score, LOWER if the real score is at least the score
+    (a beta cutoff), and UPPER if it is at most the score (no move reached alpha).
+
+    The table counts hits, misses and collisions, where a collision is a miss on a bucket that was holding other
+    positions. The counts can be used to size the table.
+    """
+
+    # The bytes used by one slot in the arrays below
+    SLOT_SIZE = 8 + 2 + 1 + 4 + 8
+
+    def __init__(self, megabytes=16):
+        """
+        megabytes is the memory budget for the table. The number of buckets is the largest power of 2 that fits in it.
+        """
+        buckets = 1
+        while buckets * 4 * self.SLOT_SIZE <= megabytes * 1024 * 1024:
+            buckets *= 2
+        self.mask = buckets - 1
+        self.clear()
+
+    def clear(self):
+        """
+        Empties the table and resets the counters. A key of 0 marks an empty slot.
+        """
+        slots = 2 * (self.mask + 1)
+        self.keys = array('Q', bytes(8 * slots))
+        self.depths = array('h', bytes(2 * slots))
+        self.bounds = array('b', bytes(slots))
+        self.scores = array('i', bytes(4 * slots))
+        self.moves = array('q', bytes(8 * slots))
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def __len__(self):
+        """
+        The number of slots in the table.
+        """
+        return len(self.keys)
+
+    def probe(self, key):
+        """
+        Looks up a position hash. Returns (depth, bound, score, best_move), or None if the position is not stored.
+        """
+        slot = (key & self.mask) * 2
+        keys = self.keys
+        if key == 0 or keys[slot] != key:
+            if key == 0 or keys[slot + 1] != key:
+                self.misses += 1
+                if keys[slot] or keys[slot + 1]:
+                    self.collisions += 1
+                return None
+            slot += 1
+        self.hits += 1
+        return self.depths[slot], self.bounds[slot], self.scores[slot], decode_move(self.moves[slot])
+
+    def store(self, key, depth, bound, score, best_move=None):
+        """
+        Stores what a search found for a position hash, following the replacement policy of the buckets.
+        best_move is a move like (start_position, end_position), or None.
+        """
+        self.stores += 1
+        slot = (key & self.mask) * 2
+        keys = self.keys
+        if keys[slot] == key or keys[slot] == 0 or depth >= self.depths[slot]:
+            if keys[slot] != key and keys[slot] != 0:
+                # The entry that loses the depth-preferred slot still goes in the always-replace slot
+                self.write(slot + 1, keys[slot], self.depths[slot], self.bounds[slot], self.scores[slot],
+                           self.moves[slot])
+            elif keys[slot + 1] == key:
+                keys[slot + 1] = 0
+        else:
+            slot += 1
+        self.write(slot, key, depth, bound, score, encode_move(best_move))
+
+    def write(self, slot, key, depth, bound, score, packed_move):
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.scores[slot] = score
+        self.moves[slot] = packed_move
+
+    def stats(self):
+        """
+        Returns the counters as a dictionary, along with how full the table is.
+        """
+        probes = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "collisions": self.collisions, "stores": self.stores,
+                "hit_rate": self.hits / probes if probes else 0.0,
+                "filled": sum(1 for key in self.keys if key) / len(self.keys)}
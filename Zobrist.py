@@ -0,0 +1,90 @@
+"""
+Zobrist hashing for Chess+ positions.
+
+Every (square, board_state character) pair has its own random 64-bit key, and the hash of a position is the XOR of the
+keys for every occupied square. Keying on the character rather than the piece type means that everything a
+board_state can tell apart (en passant pawns, invulnerable Pandas and Chickens, egg timers, unmoved Chickens, moved
+Kings and Rooks...) also gets a different hash.
+
+Some flags have no character of their own, like a Death that is invulnerable after a double capture. Each flag bit
+that a square's character does not show gets another key for that square, so two positions that only differ in those
+flags (and so in their legal moves) still get different hashes. A board made from a board_state has no such flags,
+so hash_board_state only needs the characters.
+
+On top of the squares, there is a key for white to move and a key for each square the forced_move piece can be on.
+
+The keys come from a fixed seed, so hashes are the same between runs and can be stored offline.
+"""
+import random
+
+from PieceCodes import *
+
+_random = random.Random(20240517)
+
+# Indexed by [square][char], where square is the position of the char in a board_state
+PIECE_KEYS = [{char: _random.getrandbits(64) for char in sorted(CHAR_CODES)} for _ in range(100)]
+WHITE_TO_MOVE_KEY = _random.getrandbits(64)
+FORCED_MOVE_KEYS = [_random.getrandbits(64) for _ in range(100)]
+# Indexed by [square][bit], for the flag bits a square has that its character does not show
+FLAG_KEYS = [[_random.getrandbits(64) for _ in range(8)] for _ in range(100)]
+
+# square_key results, by (mailbox index, code, flags)
+_SQUARE_KEYS = {}
+
+
+def square_key(index, code, flags):
+    """
+    The key for a mailbox square holding the given code and flags. Empty squares have no key.
+    """
+    if code == EMPTY:
+        return 0
+    try:
+        return _SQUARE_KEYS[index, code, flags]
+    except KeyError:
+        square = SQUARE_NUMBERS[index]
+        key = PIECE_KEYS[square][code_char(code, flags)]
+        hidden_flags = flags ^ board_state_square(code, flags, square // 10)[1]
+        for bit in range(8):
+            if hidden_flags >> bit & 1:
+                key ^= FLAG_KEYS[square][bit]
+        _SQUARE_KEYS[index, code, flags] = key
+        return key
+
+
+def hash_mailbox(mailbox, flags):
+    """
+    The hash of the squares alone, without the side to move or the forced move.
+    """
+    board_hash = 0
+    for index in INDICES:
+        if mailbox[index] != EMPTY:
+            board_hash ^= square_key(index, mailbox[index], flags[index])
+    return board_hash
+
+
+def extra_keys(white_to_move, forced_position):
+    """
+    The keys for the side to move and the square of the forced_move piece, if there is one.
+    """
+    keys = WHITE_TO_MOVE_KEY if white_to_move else 0
+    if forced_position is not None:
+        keys ^= FORCED_MOVE_KEYS[forced_position[0] * 10 + forced_position[1]]
+    return keys
+
+
+def hash_board_state(board_state, white_to_move=True, forced_position=None):
+    """
+    Computes the hash of a board_state from scratch. This gives the same hash as ChessBoard.position_hash for a
+    board built from the same board_state.
+
+    A 'w' or 'W' Chicken in the board_state marks the forced_move piece, like it does in set_board_state.
+    """
+    board_hash = 0
+    for square, char in enumerate(board_state):
+        if char not in CHAR_CODES:
+            continue
+        if char in "wW" and forced_position is None:
+            forced_position = divmod(square, 10)
+        # Characters are turned into the ones the ChessBoard would give back, so that both hash the same
+        board_hash ^= PIECE_KEYS[square][code_char(*CHAR_CODES[char])]
+    return board_hash ^ extra_keys(white_to_move, forced_position)
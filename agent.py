@@ -1,33 +1,60 @@
 from game import Game
 from ChessBoard import GameBoard, ChessBoard
 from Pieces import *
+from TranspositionTable import TranspositionTable, EXACT, LOWER, UPPER
+from Engine import Engine, quiet_score
+from ParallelSearch import ParallelSearch
+from SearchLimits import SearchLimits
 import time
 import random
+import os
 
 
 def score_board_state(board_state, white_to_move):
     new_board = ChessBoard(board_state, white_to_move)
-    if new_board.check_checkmate(not white_to_move):
+    # Neither player can be checkmated while there is a legal move, which saves looking for checks in most positions
+    if new_board.has_any_legal_move():
+        return quiet_score(board_state, white_to_move)
+    if new_board.check_check(not white_to_move):
         return 9999
-    if new_board.check_checkmate(white_to_move):
+    if new_board.check_check(white_to_move):
         return -9999
     else:
-        return new_board.current_value()
+        return quiet_score(board_state, white_to_move)
 
 
-def generate_move_tree(game_parameter, depth):
+def generate_move_tree(game_parameter, depth, table=None):
     # checkmate_moves = game_parameter.mate_in(game_parameter.board, depth, game_parameter.board.white_to_move)
     # if checkmate_moves is not False:
     #     return checkmate_moves
     print("NO CHECKMATE")
-    return populate_dict(game_parameter.board.board_state(), game_parameter.board.white_to_move, depth, depth)
-
-
-def populate_dict(initial_board_state, initial_white_to_move, depth, highest_depth, use_preferred_pieces=False):
+    return populate_dict(game_parameter.board.board_state(), game_parameter.board.white_to_move, depth, depth,
+                         table=table)[0]
+
+
+def populate_dict(initial_board_state, initial_white_to_move, depth, highest_depth, use_preferred_pieces=False,
+                  table=None):
+    """
+    Builds a dictionary of move -> subtree, down to the given depth, with scores at the leaves.
+    Returns (subtree, minimax score of the subtree), so the score does not have to be found by walking it again.
+
+    If a TranspositionTable is passed in, the minimax score of every subtree is stored in it. When the same position
+    comes up again at the same or a lower depth, the stored score takes the place of the subtree, which minimax treats
+    like any other leaf. Below the root only the preferred pieces are moved, and the full move list could only do
+    better for the player to move, so those scores are stored as bounds, and only used for other preferred-piece
+    subtrees.
+    """
     if depth == 0:
-        return score_board_state(initial_board_state, initial_white_to_move)
+        score = score_board_state(initial_board_state, initial_white_to_move)
+        return score, score
     dict_to_populate = {}
+    values = {}
     new_board = ChessBoard(initial_board_state, initial_white_to_move)
+    key = new_board.position_hash
+    if table is not None and depth < highest_depth:
+        entry = table.probe(key)
+        if entry is not None and entry[0] >= depth and (entry[1] == EXACT or use_preferred_pieces):
+            return entry[2], entry[2]
     if use_preferred_pieces:
         board_states = new_board.available_board_states(
             prefer_pieces=[new_board.find_pieces(initial_white_to_move, piece_type) for piece_type in
@@ -37,11 +64,20 @@ def populate_dict(initial_board_state, initial_white_to_move, depth, highest_dep
     for index, (board_state, move) in enumerate(board_states):
         if depth == highest_depth:
             print(f"{index + 1}/{len(board_states)}")
-        dict_to_populate[move] = populate_dict(board_state, not initial_white_to_move, depth - 1, highest_depth, True)
+        dict_to_populate[move], values[move] = populate_dict(board_state, not initial_white_to_move, depth - 1,
+                                                             highest_depth, True, table)
     del new_board
     if len(dict_to_populate) == 0:
-        return score_board_state(initial_board_state, initial_white_to_move)
-    return dict_to_populate
+        score = score_board_state(initial_board_state, initial_white_to_move)
+        return score, score
+    best_move = (max if initial_white_to_move else min)(values, key=values.get)
+    if table is not None:
+        if not use_preferred_pieces:
+            bound = EXACT
+        else:
+            bound = LOWER if initial_white_to_move else UPPER
+        table.store(key, depth, bound, values[best_move], best_move)
+    return dict_to_populate, values[best_move]
 
 
 # THIS CODE WAS WRITTEN BY CHATGPT
@@ -93,25 +129,49 @@ def random_board_state(average_empty_squares=0):
 
 frog_takes_knight = f"K{' ' * 30}f{' ' * 19}D{' ' * 47}k"
 
-board = GameBoard(random_board_state(95))
-game = Game(board)
-
-starting_time = time.time()
-
-print("Populating Dictionary")
+# The most time the search can take, after which it plays the best move of the last completed depth
+SEARCH_SECONDS = 300
 
-move_dict = generate_move_tree(game, 4)
+# The worker processes of a ParallelSearch import this file again on systems that cannot fork, so the game only starts
+# in the main process
+if __name__ == "__main__":
+    board = GameBoard(random_board_state(95))
+    game = Game(board)
 
-print(f"Process took {time.time() - starting_time} seconds")
+    starting_time = time.time()
 
-value, moves = minimax(move_dict, 5, True)
-move = random.choice(moves)
+    print("Searching")
 
-print("After:")
-
-print(f"{move[0]}->{move[1]}")
+    if (os.cpu_count() or 1) > 1:
+        # Split the root moves across every core. The workers and their shared table are freed once the search is done
+        with ParallelSearch() as parallel_search:
+            value, principal_variation = parallel_search.search(board, 4, SearchLimits(seconds=SEARCH_SECONDS))
+            print(f"Process took {time.time() - starting_time} seconds, searching {parallel_search.nodes} positions")
+            print(f"Search: {parallel_search.stats()}")
+            print(f"Transposition table: {parallel_search.table.stats()}, by worker: {parallel_search.worker_stats}")
+    else:
+        transposition_table = TranspositionTable()
+        engine = Engine(board, transposition_table)
+        value, principal_variation = engine.search(4, SearchLimits(seconds=SEARCH_SECONDS))
+        print(f"Process took {time.time() - starting_time} seconds, searching {engine.nodes} positions")
+        print(f"Search: {engine.stats()}")
+        print(f"Transposition table: {transposition_table.stats()}")
+
+    print("After:")
+
+    if not principal_variation:
+        if board.has_any_legal_move():
+            print("The search was stopped before it looked at any move")
+        elif board.check_check(board.white_to_move):
+            print(f"Checkmate, {'black' if board.white_to_move else 'white'} wins")
+        else:
+            print("Stalemate")
+    else:
+        move = principal_variation[0]
+        print("->".join(str(position) for position in move))
+        print(f"Principal variation: {principal_variation}")
 
-print(f"The score is {value}")
+    print(f"The score is {value}")
 
-while "Forever":
-    game.play_turn()
+    while "Forever":
+        game.play_turn()
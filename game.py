@@ -2,6 +2,13 @@ import math
 import pygame
 
 from ChessBoard import *
+from MateSearch import MateSearch
+from BackgroundAnalysis import BackgroundAnalysis, ENGINE, MATE
+
+# How long the event loop waits for an event while the analysis is running, before it checks for results again
+FRAME_MILLISECONDS = 1000 // 60
+ENGINE_ARROW_COLOUR = (46, 204, 113)
+MATE_ARROW_COLOUR = (52, 110, 235)
 
 
 class Game:
@@ -28,6 +35,12 @@ class Game:
         self.start_square = None
         self.mate_depth = 1
         self.undo_enabled = True
+        self.analysis = None
+        self.analysis_enabled = True
+        self.analysis_depth = 20
+        self.pondering = False
+        self.analysed_position = None
+        self.analysis_arrow = None
 
         self.arrows = []
         self.highlighted_squares = []
@@ -46,12 +59,23 @@ class Game:
         I also use an event with id 771 for debugging purposes: Pressing almost any key on the keyboard calls this event,
         so I use to for printing values or variables that I'd like to know as the game is running.
 
+        Searches run on a BackgroundAnalysis worker, and the loop checks for their results between events:
+        - Space looks for a mate in self.mate_depth, starting with the selected piece if there is one
+        - A starts or stops the engine, which draws its best move so far after every depth it finishes
+        - P turns pondering on or off: while it is on, the engine starts again on every new position, for either side
+        - Escape stops the search
+        A search is cancelled as soon as the position changes.
+
         The playTurn method runs once for each turn, and returns None unless there is a victor,
         in which case it return the victor.
         """
         flipped = self.board.flipped
         while "I have literally no intention of ever exiting this loop without a return statement.":
-            event = pygame.event.wait()
+            self.check_analysis()
+            if self.analysis is not None and self.analysis.running:
+                event = pygame.event.wait(FRAME_MILLISECONDS)
+            else:
+                event = pygame.event.wait()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 x, y = pygame.mouse.get_pos()
                 column, row = math.trunc(x / 60), math.trunc(y / 60)
@@ -126,28 +150,109 @@ class Game:
                             self.board.lastMovesSquares = []
                             self.board.update_board()
                 elif event.key == pygame.K_SPACE:
-                    print(f"Finding Mate in {self.mate_depth}...")
-                    try:
-                        mate_tuple = self.mate_in(self.board, self.mate_depth, self.board.white_to_move,
-                                                  prefer_pieces=[self.board.selected_piece])
-                        if mate_tuple is False:
-                            print(
-                                f"No Mate in {self.mate_depth} for {'white' if self.board.white_to_move else 'black'}")
-                        else:
-                            moves_for_mate, mate_in_number = mate_tuple
-                            print(f"Mate in {mate_in_number} for {'white' if self.board.white_to_move else 'black'}, "
-                                  f"starting with {moves_for_mate[0]}")
-                            self.mate_depth = mate_in_number
-                            starting_position, ending_position = \
-                                Game.position_to_pixels(moves_for_mate[0][0], invert=True), \
-                                Game.position_to_pixels(moves_for_mate[0][1], invert=True)
-                            self.draw_arrow(starting_position, ending_position, (52, 110, 235))
-                    except KeyboardInterrupt:
-                        print("Finding Mate Interrupted. Press CTRL + C again to exit the program.")
+                    self.start_analysis(MATE)
+                elif event.key == pygame.K_a:
+                    if self.analysis is not None and self.analysis.kind == ENGINE:
+                        self.stop_analysis()
+                    else:
+                        self.start_analysis(ENGINE)
+                elif event.key == pygame.K_p:
+                    self.pondering = not self.pondering
+                    print(f"Pondering {'on' if self.pondering else 'off'}")
+                elif event.key == pygame.K_ESCAPE:
+                    self.stop_analysis()
             elif event.type == pygame.QUIT:
+                if self.analysis is not None:
+                    self.analysis.close()
                 pygame.quit()
                 quit()
 
+    def start_analysis(self, kind):
+        """
+        Starts searching the current position in the background, for a mate (MATE) or the best move (ENGINE).
+        Whatever was being searched before is cancelled.
+        """
+        if not self.analysis_enabled:
+            print("Analysis is disabled in competitive mode.")
+            return
+        if self.analysis is None:
+            self.analysis = BackgroundAnalysis()
+        self.analysed_position = self.board.position_hash
+        self.analysis_arrow = None
+        colour = 'white' if self.board.white_to_move else 'black'
+        if kind == MATE:
+            print(f"Finding Mate in {self.mate_depth}...")
+            selected_piece = self.board.selected_piece
+            start_positions = None if selected_piece is None else [selected_piece.position]
+            self.analysis.start(MATE, self.board, self.mate_depth, start_positions)
+        else:
+            print(f"Analysing for {colour}...")
+            self.analysis.start(ENGINE, self.board, self.analysis_depth)
+
+    def stop_analysis(self):
+        if self.analysis is not None and self.analysis.running:
+            self.analysis.cancel()
+            print("Analysis stopped")
+
+    def check_analysis(self):
+        """
+        Called between events. If the position has changed since the search started, the search is cancelled, or
+        started again on the new position when pondering. Then anything the worker has found since is shown.
+        """
+        if self.analysis is None:
+            return
+        if self.analysed_position != self.board.position_hash:
+            self.analysis_arrow = None
+            if self.pondering:
+                self.start_analysis(ENGINE)
+            else:
+                self.analysis.cancel()
+                self.analysed_position = self.board.position_hash
+        colour = 'white' if self.board.white_to_move else 'black'
+        for message, payload in self.analysis.poll():
+            if message == "line":
+                depth, score, principal_variation = payload
+                if principal_variation:
+                    print(f"Depth {depth}: {score} for white, best move {principal_variation[0]}")
+                    self.analysis_arrow = (principal_variation[0], ENGINE_ARROW_COLOUR)
+                    self.draw_analysis()
+            elif message == "done":
+                print(f"Analysis finished at depth {payload['depth']} after {payload['nodes']} positions")
+            elif message == "mate":
+                mate_tuple, completed_depth = payload
+                if mate_tuple is None:
+                    print(f"No Mate in {self.mate_depth} for {colour}")
+                else:
+                    moves_for_mate, mate_in_number = mate_tuple
+                    print(f"Mate in {mate_in_number} for {colour}, starting with {moves_for_mate[0]}")
+                    self.mate_depth = mate_in_number
+                    self.analysis_arrow = (moves_for_mate[0], MATE_ARROW_COLOUR)
+                    self.draw_analysis()
+
+    def draw_analysis(self):
+        """
+        Redraws the board with the highlighted squares, the arrows and the move found by the analysis. Double moves get
+        an arrow for each part. While the right button is held down for an arrow, this waits for the next result, and
+        while a piece is selected the move is drawn over the screen as it is, so that its legal moves stay shown.
+        """
+        if pygame.mouse.get_pressed()[2]:
+            return
+        start_square = self.start_square
+        if self.board.selected_piece is None:
+            self.board.update_board(False)
+            self.board.place_png("highlighted.png", self.highlighted_squares)
+            for arrow in self.arrows:
+                self.draw_arrow(Game.position_to_pixels(arrow[0]), Game.position_to_pixels(arrow[1]),
+                                flipped=self.board.flipped, update_display=False)
+        if self.analysis_arrow is not None:
+            move, colour = self.analysis_arrow
+            for start_position, end_position in zip(move, move[1:]):
+                self.draw_arrow(Game.position_to_pixels(start_position, invert=True),
+                                Game.position_to_pixels(end_position, invert=True), colour,
+                                flipped=self.board.flipped, update_display=False)
+        self.start_square = start_square
+        pygame.display.update()
+
     def draw_arrow(self, start_pos, end_pos, colour=(252, 186, 3), thickness=10, arrow_size=-30, flipped=False,
                    update_display=True):
         """
@@ -181,38 +286,26 @@ class Game:
         if update_display:
             pygame.display.update()
 
-    def mate_in(self, board, depth, whiteToWin, prefer_pieces=None):
-        if depth == 0:
-            return False
-        if board.white_to_move == whiteToWin:
-            board_states = board.available_board_states(prefer_pieces=prefer_pieces)
-            for index, boardState in enumerate(board_states):
-                if self.mate_depth == depth:
-                    print(f"{index}/{len(board_states)}")
-                newBoard = ChessBoard(boardState=boardState[0], whiteToMove=not board.white_to_move)
-                if newBoard.checkCheckmate(not whiteToWin):
-                    del newBoard
-                    return [boardState[1]], 1
-                elif newBoard.checkCheck(not whiteToWin):
-                    recursion_result = self.mate_in(newBoard, depth - 1, whiteToWin=whiteToWin)
-                    if recursion_result is not False:
-                        moves, inverse_depth = recursion_result
-                        del newBoard
-                        return [boardState[1]] + moves, inverse_depth + 1
-                del newBoard
+    def mate_in(self, board, depth, whiteToWin, prefer_pieces=None, table=None, ordering=None, limits=None):
+        """
+        Looks for a mate in depth moves for the given player, where every move gives check.
+        Returns (moves, number of moves until mate), or False if there is no such mate.
+
+        The search is done by a MateSearch, which finds the shortest mate. If prefer_pieces is given, only the first
+        move is limited to those pieces. A TranspositionTable and MoveOrderer can be kept between searches.
+        If it is the other player's turn, every one of their replies has to leave a mate, and the moves start with the
+        reply that holds out longest. prefer_pieces is not used then.
+        If limits (a SearchLimits) stops the search before a mate is found, the result is False.
+        """
+        search = MateSearch(board, table, ordering, limits)
+        if board.white_to_move != whiteToWin:
+            result = search.mate_after_reply(depth)
         else:
-            available_moves_for_checkmate = []
-            for boardState in board.available_board_states():
-                newBoard = ChessBoard(boardState=boardState[0], whiteToMove=whiteToWin)
-                recursion_result = self.mate_in(newBoard, depth, whiteToWin)
-                del newBoard
-                if recursion_result is False:
-                    return False
-                else:
-                    moves, inverse_depth = recursion_result
-                    available_moves_for_checkmate.append(moves)
-            return random.choice(available_moves_for_checkmate), inverse_depth
-        return False
+            start_positions = None
+            if prefer_pieces is not None:
+                start_positions = [piece.position for piece in prefer_pieces if piece is not None]
+            result = search.mate_in(depth, start_positions)
+        return False if result is None else result
 
     @staticmethod
     def position_to_pixels(position, invert=False):
@@ -229,6 +322,7 @@ class CompetitiveGame(Game):
     def __init__(self, board):
         super().__init__(board)
         self.undo_enabled = False
+        self.analysis_enabled = False
 
     def playTurn(self, flipped=False):
         starting_move = self.board.white_to_move
@@ -241,6 +335,6 @@ class CompetitiveGame(Game):
             self.board.displayVictory(
                 True if self.board.victor == "White" else False if self.board.victor == "Black" else None)
 
-    def mate_in(self, board, depth, whiteToWin):
+    def mate_in(self, board, depth, whiteToWin, prefer_pieces=None, table=None, ordering=None, limits=None):
         print(f"Calculating Mates is disabled in competitive mode.")
         return False
@@ -5,27 +5,6 @@ from ChessBoard import ChessBoard, GameBoard, DumbBoard
 import random
 import time as alice
 
-mode = 0
-mate_depth = 0
-
-if len(sys.argv) > 1:
-    if sys.argv[1][0] == "-":
-        # -mode
-        mode_string = sys.argv[1][1:]
-        if mode_string in ["casual", "cas", "default"]:
-            mode = 0
-        elif mode_string in ["comp", "competitive"]:
-            mode = 1
-        elif mode_string in ["silly", "dumb", "stupid"]:
-            mode = 2
-        else:
-            print("Mode not in list, using default")
-            mode = 0
-
-    if len(sys.argv) > 2:
-        if sys.argv[2][:2] == "--":
-            mate_depth = sys.argv[2][2:]
-
 
 def random_board_state(average_empty_squares=0):
     possible_pieces = "perdbcqkfpihzxvoy"
@@ -60,39 +39,62 @@ common_boards = {"Panda End Game":
                 "No mate in 1": "R HZAKC DR PP   PPPP      F   P  xP      D  hfc     pdx    "
                                 "          h         ppp pppppp r   ak  dr"}
 
-starting_board_state, white_to_move = "RDOZAKCFDRPPPPPPPPPP                                                            pppppppppprdozakcfdr", True
-
-if mode == 0:
-    board = GameBoard(starting_board_state, white_to_move)
-    game = Game(board)
-elif mode == 1:
-    board = GameBoard(starting_board_state, white_to_move)
-    game = CompetitiveGame(board)
-elif mode == 2:
-    board = DumbBoard(starting_board_state, white_to_move)
-    game = Game(board)
-else:
-    board = GameBoard()
-    game = Game(board)
-
-
-
-game.mate_depth = int(mate_depth)
-
-while game.board.victor is None or type(game) == Game:
-    game.playTurn()
-    if game.board.victor is not None:
-        game.board.displayVictory(True if game.board.victor == "White"
-                                  else False if game.board.victor == "Black" else None)
-
-game.board.displayVictory(True if game.board.victor == "White" else False if game.board.victor == "Black" else None)
-print("Game Over")
-
-while "Never exiting this loop LLLLLL":
-    event = pygame.event.wait()
-    if event.type == pygame.QUIT:
-        pygame.quit()
-        quit()
-    alice.sleep(3)  # The only purpose of this is to prevent "Python is not responding" pop-up.
-    # time.sleep(3) is so the CPU isn't overwhelmed
+# The worker processes of BackgroundAnalysis import this file again on platforms that spawn them
+if __name__ == "__main__":
+    mode = 0
+    mate_depth = 0
+
+    if len(sys.argv) > 1:
+        if sys.argv[1][0] == "-":
+            # -mode
+            mode_string = sys.argv[1][1:]
+            if mode_string in ["casual", "cas", "default"]:
+                mode = 0
+            elif mode_string in ["comp", "competitive"]:
+                mode = 1
+            elif mode_string in ["silly", "dumb", "stupid"]:
+                mode = 2
+            else:
+                print("Mode not in list, using default")
+                mode = 0
+
+        if len(sys.argv) > 2:
+            if sys.argv[2][:2] == "--":
+                mate_depth = sys.argv[2][2:]
+
+    starting_board_state, white_to_move = "RDOZAKCFDRPPPPPPPPPP                                                            pppppppppprdozakcfdr", True
+
+    if mode == 0:
+        board = GameBoard(starting_board_state, white_to_move)
+        game = Game(board)
+    elif mode == 1:
+        board = GameBoard(starting_board_state, white_to_move)
+        game = CompetitiveGame(board)
+    elif mode == 2:
+        board = DumbBoard(starting_board_state, white_to_move)
+        game = Game(board)
+    else:
+        board = GameBoard()
+        game = Game(board)
+
+
+
+    game.mate_depth = int(mate_depth)
+
+    while game.board.victor is None or type(game) == Game:
+        game.playTurn()
+        if game.board.victor is not None:
+            game.board.displayVictory(True if game.board.victor == "White"
+                                      else False if game.board.victor == "Black" else None)
+
+    game.board.displayVictory(True if game.board.victor == "White" else False if game.board.victor == "Black" else None)
+    print("Game Over")
+
+    while "Never exiting this loop LLLLLL":
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            pygame.quit()
+            quit()
+        alice.sleep(3)  # The only purpose of this is to prevent "Python is not responding" pop-up.
+        # time.sleep(3) is so the CPU isn't overwhelmed
 
@@ -1,4 +1,5 @@
 import ChessBoard as cb
+from Engine import quiet_score
 
 
 def minmax(boardstate, white_to_play, depth):
@@ -8,8 +9,8 @@ def minmax(boardstate, white_to_play, depth):
 
     if depth <= 1:
         for state in available_states:
-            board.set_board_state(state[0])
-            material_value = board.material_values
+            # material_values is from Black's point of view, so the quiescence score is flipped to match it
+            material_value = -quiet_score(state[0], not white_to_play)
             state_values[state[0]] = material_value
         state_values = sorted(state_values.items(), key=lambda x: x[1], reverse=not white_to_play)
         return state_values[0]